@@ -4,6 +4,9 @@ from .forms import CustomUserCreationForm, CustomErrorList
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.db.models import Prefetch
+from cart.models import Item, PurchaseSummary
+from movies import projections
 from .models import UserProfile
 
 @login_required
@@ -48,5 +51,11 @@ def signup(request):
 def orders(request):
     template_data = {}
     template_data['title'] = 'Orders'
-    template_data['orders'] = request.user.order_set.all()
+    # Order lines with just the movie columns the page shows, in one query
+    items = Item.objects.select_related('movie').only(
+        'price', 'quantity', 'order', *projections.fields('price', 'movie')
+    )
+    template_data['orders'] = request.user.order_set.prefetch_related(Prefetch('item_set', queryset=items))
+    # Kept by the outbox worker, so the latest order may not be counted yet
+    template_data['summary'] = PurchaseSummary.objects.filter(user=request.user).first()
     return render(request, 'accounts/orders.html', {'template_data': template_data})
\ No newline at end of file
@@ -1,5 +1,12 @@
 from django.contrib import admin
-from .models import Order, Item
+from .models import Order, Item, OutboxEvent, PurchaseSummary
+
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'created_at', 'attempts', 'processed_at']
+    list_filter = ['kind']
+    readonly_fields = ['created_at']
 
 admin.site.register(Order)
-admin.site.register(Item)
\ No newline at end of file
+admin.site.register(Item)
+admin.site.register(OutboxEvent, OutboxEventAdmin)
+admin.site.register(PurchaseSummary)
\ No newline at end of file
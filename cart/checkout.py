@@ -0,0 +1,44 @@
+"""Checkout: turn a session cart into an Order in one transaction.
+
+The order, all of its items (one bulk INSERT) and an outbox event are
+written together or not at all. The purchase counters and the buyer's
+summary are updated from the event by the process_outbox worker (see
+cart.outbox), so checkout latency does not grow with its side effects.
+"""
+from django.db import transaction
+from movies import projections
+from movies.models import Movie
+from . import outbox
+from .models import Order, Item
+from .utils import calculate_cart_total
+
+
+def cart_quantities(cart):
+    """{movie_id: quantity} from a session cart, dropping lines that are not positive"""
+    quantities = {}
+    for movie_id, quantity in cart.items():
+        try:
+            movie_id, quantity = int(movie_id), int(quantity)
+        except (TypeError, ValueError):
+            continue
+        if quantity > 0:
+            quantities[movie_id] = quantity
+    return quantities
+
+
+def place_order(user, cart, state=None):
+    """Create the Order for a cart; returns None if nothing in it can be bought"""
+    quantities = cart_quantities(cart)
+    movies = list(Movie.objects.filter(id__in=quantities).only(*projections.fields('price')))
+    if not movies:
+        return None
+    lines = {str(movie.id): quantities[movie.id] for movie in movies}
+
+    with transaction.atomic():
+        order = Order.objects.create(user=user, total=calculate_cart_total(lines, movies))
+        Item.objects.bulk_create([
+            Item(order=order, movie_id=movie.id, price=movie.price, quantity=quantities[movie.id])
+            for movie in movies
+        ])
+        outbox.order_placed(order, {movie.id: quantities[movie.id] for movie in movies}, state)
+    return order
@@ -0,0 +1,85 @@
+import time
+from collections import defaultdict
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from cart import views
+from movies.models import Movie
+
+BACKENDS = (
+    ('session', 'cart.storage.SessionCartStorage'),
+    ('cookie', 'cart.storage.CookieCartStorage'),
+)
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    help = ('Replay anonymous cart sessions (add movies, view the cart, clear it) against the '
+            'session and the signed-cookie cart storage and count database writes per action')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--visitors', type=int, default=50)
+        parser.add_argument('--cart-size', type=int, default=5,
+                            help='Movies each visitor adds before viewing and clearing the cart')
+
+    def handle(self, *args, **options):
+        movie_ids = list(Movie.objects.order_by('id').values_list('id', flat=True)[:options['cart_size']])
+        if not movie_ids:
+            raise CommandError('Needs at least one Movie (run populate_movies).')
+        self.factory = RequestFactory()
+
+        for label, backend in BACKENDS:
+            with override_settings(CART_ANONYMOUS_STORAGE=backend):
+                stats, cookie_bytes = self.replay(movie_ids, options['visitors'])
+            for action in ('add', 'view', 'clear'):
+                requests, queries, writes, elapsed = stats[action]
+                self.stdout.write(
+                    f'{label:>8} {action:>6}: {queries / requests:5.1f} queries, '
+                    f'{writes / requests:4.1f} writes, {elapsed / requests * 1000:6.2f} ms per request'
+                )
+            self.stdout.write(f'{label:>8} largest cart cookie: {cookie_bytes} bytes')
+
+    def replay(self, movie_ids, visitors):
+        stats = defaultdict(lambda: [0, 0, 0, 0.0])
+        cookie_bytes = 0
+        session_keys = []
+        for _ in range(visitors):
+            cookies = {}
+            for movie_id in movie_ids:
+                self.call(stats['add'], cookies, views.add, 'post', {'quantity': '2'}, id=movie_id)
+            cookie_bytes = max(cookie_bytes, len(cookies.get(settings.CART_COOKIE_NAME, '')))
+            self.call(stats['view'], cookies, views.index)
+            self.call(stats['clear'], cookies, views.clear)
+            if settings.SESSION_COOKIE_NAME in cookies:
+                session_keys.append(cookies[settings.SESSION_COOKIE_NAME])
+
+        session_store = import_module(settings.SESSION_ENGINE).SessionStore
+        for session_key in session_keys:
+            session_store(session_key=session_key).delete()
+        return stats, cookie_bytes
+
+    def call(self, stats, cookies, view, method='get', data=None, **kwargs):
+        request = getattr(self.factory, method)('/', data or {})
+        request.COOKIES.update(cookies)
+        request.user = AnonymousUser()
+        handler = SessionMiddleware(lambda request: view(request, **kwargs))
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = handler(request)
+            elapsed = time.perf_counter() - started
+
+        for name, morsel in response.cookies.items():
+            if morsel['max-age'] == 0:
+                cookies.pop(name, None)
+            else:
+                cookies[name] = morsel.value
+        stats[0] += 1
+        stats[1] += len(queries)
+        stats[2] += sum(1 for query in queries if query['sql'].lstrip().upper().startswith(WRITES))
+        stats[3] += elapsed
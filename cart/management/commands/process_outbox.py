@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from cart import outbox
+
+PRUNE_EVERY = 3600
+
+
+class Command(BaseCommand):
+    help = 'Apply queued post-purchase side effects (purchase counters and buyer summaries)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=outbox.BATCH_SIZE)
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when no event is due instead of polling for new ones')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--retention-days', type=int, default=outbox.RETENTION_DAYS,
+                            help='Delete events processed longer ago than this')
+
+    def handle(self, *args, **options):
+        given_up = outbox.OutboxEvent.objects.filter(
+            processed_at__isnull=True, attempts__gte=outbox.MAX_ATTEMPTS
+        ).count()
+        if given_up:
+            self.stderr.write(self.style.WARNING(
+                f'{given_up} events failed {outbox.MAX_ATTEMPTS} times and are no longer retried.'
+            ))
+
+        total = 0
+        last_prune = None
+        try:
+            while True:
+                if last_prune is None or time.monotonic() - last_prune > PRUNE_EVERY:
+                    pruned = outbox.prune(options['retention_days'])
+                    if pruned:
+                        self.stdout.write(f'Pruned {pruned} processed events.')
+                    last_prune = time.monotonic()
+
+                processed, failed = outbox.process_batch(options['batch_size'])
+                total += processed
+                if failed:
+                    self.stderr.write(f'{failed} events failed and will be retried.')
+                if processed or failed:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} events.'))
@@ -0,0 +1,135 @@
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from cart import outbox
+from cart.checkout import cart_quantities, place_order
+from cart.models import Item, Order, OutboxEvent
+from movies.models import Movie
+from regions.counters import increment_popularity
+from regions.models import MoviePopularity, State
+
+USERNAME_PREFIX = 'stress-checkout-'
+
+
+class Command(BaseCommand):
+    help = ('Fire concurrent checkouts at a few hot movies, then verify that no order line '
+            'and no popularity increment was lost once the outbox is drained')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=400, help='Total checkouts')
+        parser.add_argument('--movies', type=int, default=5,
+                            help='Size of the hot set every cart draws from')
+        parser.add_argument('--cart-size', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the orders and counter increments instead of reverting them')
+
+    def handle(self, *args, **options):
+        state = State.objects.first()
+        movie_ids = list(Movie.objects.order_by('id').values_list('id', flat=True)[:options['movies']])
+        if state is None or not movie_ids:
+            raise CommandError('Needs at least one State and one Movie (run populate_regions and populate_movies).')
+        users = [
+            User.objects.get_or_create(username=f'{USERNAME_PREFIX}{n}')[0]
+            for n in range(options['workers'])
+        ]
+        rng = random.Random(options['seed'])
+        cart_size = min(options['cart_size'], len(movie_ids))
+        carts = [
+            {str(movie_id): str(rng.randint(1, 3)) for movie_id in rng.sample(movie_ids, cart_size)}
+            for _ in range(options['orders'])
+        ]
+        self.drain()
+        before = self.purchase_counts(movie_ids, state)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = list(pool.map(
+                lambda worker: self.run_worker(users[worker], carts[worker::options['workers']], state),
+                range(options['workers']),
+            ))
+        elapsed = time.perf_counter() - started
+        started = time.perf_counter()
+        drained = self.drain()
+        drain_elapsed = time.perf_counter() - started
+
+        placed = [entry for worker_placed, _ in results for entry in worker_placed]
+        failures = [error for _, worker_failures in results for error in worker_failures]
+        expected = Counter()
+        for _, quantities in placed:
+            expected.update(quantities)
+        after = self.purchase_counts(movie_ids, state)
+        increments = Counter({movie_id: after[movie_id] - before[movie_id] for movie_id in movie_ids})
+        order_ids = [order_id for order_id, _ in placed]
+        lines = Item.objects.filter(order_id__in=order_ids).count()
+        expected_lines = sum(len(quantities) for _, quantities in placed)
+
+        self.stdout.write(
+            f'{len(placed)} orders ({expected_lines} lines) in {elapsed:.2f}s with {options["workers"]} workers: '
+            f'{len(placed) / elapsed:.0f} orders/s, {len(failures)} failed'
+        )
+        for error in failures[:5]:
+            self.stderr.write(f'  {error}')
+        self.stdout.write(
+            f'Outbox: {drained} events applied in {drain_elapsed:.2f}s '
+            f'({drained / max(drain_elapsed, 1e-9):.0f} events/s)'
+        )
+        lost = sum(expected.values()) - sum(increments.values())
+        self.stdout.write(
+            f'Purchase counters: expected +{sum(expected.values())}, found +{sum(increments.values())}'
+        )
+        self.stdout.write(f'Order lines: expected {expected_lines}, found {lines}')
+
+        if not options['keep']:
+            Order.objects.filter(id__in=order_ids).delete()
+            OutboxEvent.objects.filter(payload__order_id__in=order_ids).delete()
+            increment_popularity(
+                'purchase_count', {(movie_id, state.id): -count for movie_id, count in increments.items()}
+            )
+            MoviePopularity.objects.filter(
+                movie_id__in=movie_ids, state=state, purchase_count=0, view_count=0
+            ).delete()
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+        if lost or increments != expected or lines != expected_lines:
+            raise CommandError('Lost updates detected.')
+        self.stdout.write(self.style.SUCCESS('No lost updates.'))
+
+    def run_worker(self, user, carts, state):
+        placed, failures = [], []
+        try:
+            for cart in carts:
+                try:
+                    order = place_order(user, cart, state)
+                except DatabaseError as e:
+                    failures.append(str(e))
+                    continue
+                placed.append((order.id, cart_quantities(cart)))
+        finally:
+            # Each worker thread has its own connection
+            connection.close()
+        return placed, failures
+
+    def drain(self):
+        applied = 0
+        while True:
+            processed, failed = outbox.process_batch()
+            if failed:
+                raise CommandError(f'{failed} outbox events failed; see OutboxEvent.last_error.')
+            if not processed:
+                return applied
+            applied += processed
+
+    def purchase_counts(self, movie_ids, state):
+        counts = Counter({movie_id: 0 for movie_id in movie_ids})
+        counts.update(dict(
+            MoviePopularity.objects.filter(movie_id__in=movie_ids, state=state)
+            .values_list('movie_id', 'purchase_count')
+        ))
+        return counts
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def backfill_purchase_summaries(apps, schema_editor):
+    Order = apps.get_model('cart', 'Order')
+    Item = apps.get_model('cart', 'Item')
+    PurchaseSummary = apps.get_model('cart', 'PurchaseSummary')
+    orders = {
+        row['user']: row
+        for row in Order.objects.order_by().values('user').annotate(
+            orders_count=Count('id'), total_spent=Sum('total'), last_order_at=Max('date')
+        )
+    }
+    items = dict(
+        Item.objects.order_by().values('order__user').annotate(count=Sum('quantity'))
+        .values_list('order__user', 'count')
+    )
+    PurchaseSummary.objects.bulk_create([
+        PurchaseSummary(
+            user_id=user_id,
+            orders_count=row['orders_count'],
+            items_count=items.get(user_id) or 0,
+            total_spent=row['total_spent'] or 0,
+            last_order_at=row['last_order_at'],
+        )
+        for user_id, row in orders.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('cart', '0002_item'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchaseSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('orders_count', models.IntegerField(default=0)),
+                ('items_count', models.IntegerField(default=0)),
+                ('total_spent', models.IntegerField(default=0)),
+                ('last_order_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=50)),
+                ('payload', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['available_at', 'id'], name='outbox_pending_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_purchase_summaries, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from movies.models import Movie
 
 class Order(models.Model):
@@ -19,4 +20,44 @@ class Item(models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
 
     def __str__(self):
-        return str(self.id) + ' - ' + self.movie.name
\ No newline at end of file
+        return str(self.id) + ' - ' + self.movie.name
+
+
+class OutboxEvent(models.Model):
+    """A side effect of a committed write, applied later by process_outbox (see cart.outbox)"""
+    ORDER_PLACED = 'order_placed'
+
+    id = models.AutoField(primary_key=True)
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Not retried before this time; pushed back after each failed attempt
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's queue: unprocessed events in id order
+            models.Index(
+                fields=['available_at', 'id'],
+                name='outbox_pending_idx',
+                condition=models.Q(processed_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.id} - {self.kind}'
+
+
+class PurchaseSummary(models.Model):
+    """Per-user purchase totals, kept by the outbox worker"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    orders_count = models.IntegerField(default=0)
+    items_count = models.IntegerField(default=0)
+    total_spent = models.IntegerField(default=0)
+    last_order_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.user.username} - {self.orders_count} orders'
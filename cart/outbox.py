@@ -0,0 +1,181 @@
+"""Transactional outbox for post-purchase side effects.
+
+Checkout writes one OutboxEvent in the same transaction as the Order and
+its Items and nothing else (see cart.checkout). The process_outbox worker
+drains the table in batches and applies the effects: the per-state
+purchase counters (regions.counters) and the buyer's PurchaseSummary.
+
+An event is marked processed in the same transaction that applies its
+effects, so a crash leaves both undone and the event is picked up again;
+every effect lands exactly once. When a batch fails its events are
+retried one at a time, and an event that keeps failing is pushed back
+with exponential backoff until it has failed MAX_ATTEMPTS times. It then
+stays in the table with its last error for inspection.
+
+Run one worker on SQLite. On PostgreSQL several workers can share the
+queue, because batches are claimed with SELECT ... FOR UPDATE SKIP LOCKED.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from movies.models import Movie
+from regions.counters import increment_popularity
+from regions.models import State
+from .models import OutboxEvent, PurchaseSummary
+
+BATCH_SIZE = 500
+MAX_ATTEMPTS = 10
+MAX_BACKOFF = timedelta(hours=1)
+RETENTION_DAYS = 7
+
+logger = logging.getLogger(__name__)
+
+
+class ClaimConflict(Exception):
+    """Another worker processed some of the events of this batch first"""
+
+
+def order_placed(order, quantities, state):
+    """Queue the side effects of a new order; call inside the order's transaction"""
+    OutboxEvent.objects.create(kind=OutboxEvent.ORDER_PLACED, payload={
+        'order_id': order.id,
+        'user_id': order.user_id,
+        'state_id': state.id if state is not None else None,
+        'total': order.total,
+        'date': order.date.isoformat(),
+        'lines': [[movie_id, quantity] for movie_id, quantity in quantities.items()],
+    })
+
+
+def pending():
+    """Events still to apply, matching outbox_pending_idx"""
+    return OutboxEvent.objects.filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+
+
+def process_batch(batch_size=BATCH_SIZE):
+    """Apply up to batch_size due events; returns (processed, failed)"""
+    now = timezone.now()
+    due = pending().filter(available_at__lte=now)
+    try:
+        with transaction.atomic():
+            events = _claim(due, batch_size, now)
+            apply_events(events)
+        return len(events), 0
+    except Exception:
+        logger.exception('Outbox batch failed; retrying its events one at a time')
+
+    processed = failed = 0
+    for event_id in due.order_by('id').values_list('id', flat=True)[:batch_size]:
+        try:
+            with transaction.atomic():
+                events = _claim(pending().filter(id=event_id), 1, now)
+                apply_events(events)
+            processed += len(events)
+        except ClaimConflict:
+            continue
+        except Exception as e:
+            failed += 1
+            _record_failure(event_id, e, now)
+    return processed, failed
+
+
+def _claim(queryset, limit, now):
+    """Lock and mark up to `limit` events as processed in the current transaction"""
+    if connection.features.has_select_for_update_skip_locked:
+        queryset = queryset.select_for_update(skip_locked=True)
+    events = list(queryset.order_by('id')[:limit])
+    if events:
+        claimed = OutboxEvent.objects.filter(
+            id__in=[event.id for event in events], processed_at__isnull=True
+        ).update(processed_at=now)
+        if claimed != len(events):
+            raise ClaimConflict()
+    return events
+
+
+def _record_failure(event_id, error, now):
+    attempts = OutboxEvent.objects.filter(id=event_id).values_list('attempts', flat=True).first() or 0
+    backoff = min(timedelta(seconds=2 ** attempts), MAX_BACKOFF)
+    OutboxEvent.objects.filter(id=event_id).update(
+        attempts=F('attempts') + 1, last_error=str(error)[:2000], available_at=now + backoff,
+    )
+
+
+def apply_events(events):
+    by_kind = {}
+    for event in events:
+        by_kind.setdefault(event.kind, []).append(event.payload)
+    for kind, payloads in by_kind.items():
+        if kind not in HANDLERS:
+            raise ValueError(f'Unknown outbox event kind: {kind}')
+        HANDLERS[kind](payloads)
+
+
+def apply_orders_placed(payloads):
+    """Purchase counters and buyer summaries for a batch of new orders"""
+    movie_ids = {movie_id for payload in payloads for movie_id, _ in payload['lines']}
+    # Movies, states or users deleted since the order was placed have nothing to update
+    movie_ids = set(Movie.objects.filter(id__in=movie_ids).values_list('id', flat=True))
+    state_ids = set(State.objects.filter(
+        id__in={payload['state_id'] for payload in payloads}
+    ).values_list('id', flat=True))
+    user_ids = set(User.objects.filter(
+        id__in={payload['user_id'] for payload in payloads}
+    ).values_list('id', flat=True))
+
+    popularity = Counter()
+    summaries = {}
+    for payload in payloads:
+        if payload['state_id'] in state_ids:
+            for movie_id, quantity in payload['lines']:
+                if movie_id in movie_ids:
+                    popularity[(movie_id, payload['state_id'])] += quantity
+        if payload['user_id'] not in user_ids:
+            continue
+        summary = summaries.setdefault(payload['user_id'], {
+            'orders_count': 0, 'items_count': 0, 'total_spent': 0, 'last_order_at': None,
+        })
+        summary['orders_count'] += 1
+        summary['items_count'] += sum(quantity for _, quantity in payload['lines'])
+        summary['total_spent'] += payload['total']
+        date = parse_datetime(payload['date'])
+        summary['last_order_at'] = max(filter(None, [summary['last_order_at'], date]))
+
+    increment_popularity('purchase_count', popularity)
+    _add_to_summaries(summaries)
+
+
+def _add_to_summaries(summaries):
+    if not summaries:
+        return
+    PurchaseSummary.objects.bulk_create(
+        [PurchaseSummary(user_id=user_id) for user_id in summaries], ignore_conflicts=True
+    )
+    rows = list(PurchaseSummary.objects.select_for_update().filter(user_id__in=summaries))
+    for row in rows:
+        added = summaries[row.user_id]
+        row.orders_count += added['orders_count']
+        row.items_count += added['items_count']
+        row.total_spent += added['total_spent']
+        row.last_order_at = max(filter(None, [row.last_order_at, added['last_order_at']]))
+    PurchaseSummary.objects.bulk_update(
+        rows, ['orders_count', 'items_count', 'total_spent', 'last_order_at']
+    )
+
+
+def prune(days=RETENTION_DAYS):
+    """Delete events processed more than `days` ago; returns the number deleted"""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = OutboxEvent.objects.filter(processed_at__lt=cutoff).delete()
+    return deleted
+
+
+HANDLERS = {
+    OutboxEvent.ORDER_PLACED: apply_orders_placed,
+}
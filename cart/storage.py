@@ -0,0 +1,216 @@
+"""Where the cart lives between requests.
+
+A cart is {movie_id: quantity}. Views get it with get_cart(request), change
+it with set() and clear(), and pass their response through save(). That
+works the same way whatever backend holds the cart:
+
+SessionCartStorage keeps the cart in request.session['cart'] as
+{"<movie id>": "<quantity>"}. With the database session engine every
+change rewrites the visitor's django_session row, and the first change
+creates that row.
+
+CookieCartStorage keeps the cart in a signed cookie, so an anonymous
+visitor's cart costs no database writes. The cookie packs the cart as
+varints: ids in ascending order, each stored as the gap from the
+previous id and followed by its quantity. The bytes are base64-encoded
+and signed with a TimestampSigner. If the cookie would be larger than
+CART_COOKIE_MAX_BYTES, the cart moves to the session, and it moves back
+once it is small enough.
+
+Anonymous visitors use CART_ANONYMOUS_STORAGE. Signed-in users always use
+the session, which login() carries over and logout() flushes. A cart
+still in the cookie after sign-in moves into the session on the next cart
+page.
+"""
+import base64
+
+from django.conf import settings
+from django.core import signing
+from django.utils.module_loading import import_string
+from .checkout import cart_quantities
+
+SESSION_KEY = 'cart'
+SIGNING_SALT = 'cart.storage'
+
+
+def get_cart(request):
+    """The cart storage of this request, created once per request"""
+    if not hasattr(request, '_cart_storage'):
+        if request.user.is_authenticated:
+            backend = SessionCartStorage
+        else:
+            backend = import_string(settings.CART_ANONYMOUS_STORAGE)
+        request._cart_storage = backend(request)
+    return request._cart_storage
+
+
+class CartStorage:
+    """Base class: subclasses implement load() and persist(response)"""
+
+    def __init__(self, request):
+        self.request = request
+        self.modified = False
+        self.quantities = self.load()
+
+    def load(self):
+        raise NotImplementedError
+
+    def persist(self, response):
+        raise NotImplementedError
+
+    def __len__(self):
+        return len(self.quantities)
+
+    @property
+    def lines(self):
+        """The cart in the session format, as checkout and cart totals expect it"""
+        return {str(movie_id): str(quantity) for movie_id, quantity in self.quantities.items()}
+
+    def quantity(self, movie_id):
+        return self.quantities.get(int(movie_id), 0)
+
+    def set(self, movie_id, quantity):
+        """Put `quantity` of a movie in the cart; anything but a positive integer removes it"""
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            quantity = 0
+        if quantity > 0:
+            self.quantities[int(movie_id)] = quantity
+        else:
+            self.quantities.pop(int(movie_id), None)
+        self.modified = True
+
+    def clear(self):
+        self.quantities = {}
+        self.modified = True
+
+    def save(self, response):
+        """Store the cart if it changed; returns the response"""
+        if self.modified:
+            self.persist(response)
+            self.modified = False
+        return response
+
+
+class SessionCartStorage(CartStorage):
+
+    def load(self):
+        quantities = cart_quantities(self.request.session.get(SESSION_KEY, {}))
+        left_in_cookie = read_cookie(self.request)
+        if left_in_cookie:
+            quantities.update(left_in_cookie)
+            self.modified = True
+        return quantities
+
+    def persist(self, response):
+        self.request.session[SESSION_KEY] = self.lines
+        if settings.CART_COOKIE_NAME in self.request.COOKIES:
+            delete_cookie(response)
+
+
+class CookieCartStorage(CartStorage):
+
+    def load(self):
+        quantities = read_cookie(self.request)
+        if quantities is None:
+            # No cookie yet, or a cart too large for one
+            quantities = cart_quantities(self.request.session.get(SESSION_KEY, {}))
+        return quantities
+
+    def persist(self, response):
+        value = cookie_signer().sign(encode(self.quantities)) if self.quantities else None
+        if value is not None and len(value) <= settings.CART_COOKIE_MAX_BYTES:
+            write_cookie(response, value)
+            if SESSION_KEY in self.request.session:
+                del self.request.session[SESSION_KEY]
+        else:
+            if value is not None:
+                self.request.session[SESSION_KEY] = self.lines
+            elif SESSION_KEY in self.request.session:
+                del self.request.session[SESSION_KEY]
+            if settings.CART_COOKIE_NAME in self.request.COOKIES:
+                delete_cookie(response)
+
+
+def pack(quantities):
+    """Varint bytes of {movie_id: quantity}: ascending id gaps, each followed by its quantity"""
+    packed = bytearray()
+    previous = 0
+    for movie_id in sorted(quantities):
+        _write_varint(packed, movie_id - previous)
+        _write_varint(packed, quantities[movie_id])
+        previous = movie_id
+    return bytes(packed)
+
+
+def unpack(data):
+    quantities = {}
+    movie_id = position = 0
+    while position < len(data):
+        gap, position = _read_varint(data, position)
+        quantity, position = _read_varint(data, position)
+        movie_id += gap
+        quantities[movie_id] = quantity
+    return quantities
+
+
+def _write_varint(packed, value):
+    while value >= 0x80:
+        packed.append(value & 0x7F | 0x80)
+        value >>= 7
+    packed.append(value)
+
+
+def _read_varint(data, position):
+    value = shift = 0
+    while True:
+        if position >= len(data):
+            raise ValueError('Truncated cart cookie')
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def encode(quantities):
+    return base64.urlsafe_b64encode(pack(quantities)).rstrip(b'=').decode()
+
+
+def decode(value):
+    return unpack(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+
+
+def cookie_signer():
+    # The same signer request.get_signed_cookie() uses for this cookie
+    return signing.get_cookie_signer(salt=settings.CART_COOKIE_NAME + SIGNING_SALT)
+
+
+def read_cookie(request):
+    """{movie_id: quantity} from the cart cookie, or None if it is missing, tampered with or expired"""
+    value = request.get_signed_cookie(
+        settings.CART_COOKIE_NAME, default=None, salt=SIGNING_SALT,
+        max_age=settings.SESSION_COOKIE_AGE,
+    )
+    if value is None:
+        return None
+    try:
+        return decode(value)
+    except ValueError:
+        return None
+
+
+def write_cookie(response, value):
+    response.set_cookie(
+        settings.CART_COOKIE_NAME, value,
+        max_age=settings.SESSION_COOKIE_AGE,
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite=settings.SESSION_COOKIE_SAMESITE,
+    )
+
+
+def delete_cookie(response):
+    response.delete_cookie(settings.CART_COOKIE_NAME, samesite=settings.SESSION_COOKIE_SAMESITE)
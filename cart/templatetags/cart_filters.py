@@ -4,4 +4,5 @@ register = template.Library()
 
 @register.filter(name='get_quantity')
 def get_cart_quantity(cart, movie_id):
-    return cart[str(movie_id)]
\ No newline at end of file
+    """Quantity of a movie in a cart storage (see cart.storage)"""
+    return cart.quantity(movie_id)
\ No newline at end of file
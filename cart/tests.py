@@ -1,3 +1,193 @@
-from django.test import TestCase
+import base64
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DatabaseError
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from movies.models import Movie
+from regions.models import MoviePopularity, State
+from . import outbox, storage
+from .checkout import place_order
+from .models import Order, OutboxEvent, PurchaseSummary
+
+
+def create_movies(count):
+    return [
+        Movie.objects.create(name=f'Movie {n}', price=10 + n, description='A movie')
+        for n in range(count)
+    ]
+
+
+def cookie_request(value):
+    request = RequestFactory().get('/')
+    request.COOKIES[settings.CART_COOKIE_NAME] = value
+    return request
+
+
+class CartCookieCodecTests(TestCase):
+    def test_pack_round_trip(self):
+        quantities = {1: 1, 5: 3, 127: 2, 128: 1, 300: 200, 2 ** 31: 9}
+        self.assertEqual(storage.unpack(storage.pack(quantities)), quantities)
+        self.assertEqual(storage.decode(storage.encode(quantities)), quantities)
+        self.assertEqual(storage.unpack(storage.pack({})), {})
+
+    def test_ids_are_packed_as_gaps(self):
+        # Three small gaps and quantities take one byte each
+        self.assertEqual(len(storage.pack({1000: 1, 1001: 2, 1002: 3})), 2 + 1 + 1 + 1 + 1 + 1)
+
+    def test_read_cookie_round_trip(self):
+        value = storage.cookie_signer().sign(storage.encode({3: 2, 9: 1}))
+        self.assertEqual(storage.read_cookie(cookie_request(value)), {3: 2, 9: 1})
+
+    def test_read_cookie_rejects_a_tampered_cookie(self):
+        value = storage.cookie_signer().sign(storage.encode({3: 2}))
+        tampered = storage.encode({3: 99}) + value[value.index(':'):]
+        self.assertIsNone(storage.read_cookie(cookie_request(tampered)))
+        self.assertIsNone(storage.read_cookie(cookie_request('garbage')))
+
+    def test_read_cookie_rejects_a_truncated_payload(self):
+        # Correctly signed, but the last varint has its continuation bit set
+        truncated = base64.urlsafe_b64encode(bytes([0x05, 0x81])).rstrip(b'=').decode()
+        value = storage.cookie_signer().sign(truncated)
+        self.assertIsNone(storage.read_cookie(cookie_request(value)))
+
+    def test_missing_cookie(self):
+        self.assertIsNone(storage.read_cookie(RequestFactory().get('/')))
+
+
+class CartStorageTests(TestCase):
+    def setUp(self):
+        self.movies = create_movies(3)
+
+    def add(self, movie, quantity):
+        return self.client.post(reverse('cart.add', args=[movie.id]), {'quantity': quantity})
+
+    def cart_cookie(self):
+        morsel = self.client.cookies.get(settings.CART_COOKIE_NAME)
+        return morsel.value if morsel is not None and morsel.value else None
+
+    def test_anonymous_cart_lives_in_the_cookie(self):
+        self.add(self.movies[0], '2')
+        self.add(self.movies[1], '1')
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+        value = self.cart_cookie()
+        self.assertEqual(
+            storage.read_cookie(cookie_request(value)), {self.movies[0].id: 2, self.movies[1].id: 1}
+        )
+        response = self.client.get(reverse('cart.index'))
+        self.assertContains(response, f'${2 * self.movies[0].price + self.movies[1].price}')
+
+    def test_invalid_quantity_removes_the_line(self):
+        self.add(self.movies[0], '2')
+        self.add(self.movies[0], 'many')
+        self.assertIsNone(self.cart_cookie())
+
+    def test_large_cart_falls_back_to_the_session_and_back(self):
+        self.add(self.movies[0], '1')
+        self.add(self.movies[1], '1')
+        # Room for exactly these two lines
+        with self.settings(CART_COOKIE_MAX_BYTES=len(self.cart_cookie())):
+            self.add(self.movies[2], '1')
+            self.assertIsNone(self.cart_cookie())
+            self.assertEqual(
+                self.client.session[storage.SESSION_KEY], {str(movie.id): '1' for movie in self.movies}
+            )
+            response = self.client.get(reverse('cart.index'))
+            self.assertContains(response, f'${sum(movie.price for movie in self.movies)}')
+
+            self.add(self.movies[2], '0')
+            self.assertIsNotNone(self.cart_cookie())
+            self.assertNotIn(storage.SESSION_KEY, self.client.session)
+
+    def test_cookie_cart_moves_into_the_session_on_login(self):
+        self.add(self.movies[0], '4')
+        user = User.objects.create(username='buyer')
+        self.client.force_login(user)
+        session = self.client.session
+        session[storage.SESSION_KEY] = {str(self.movies[1].id): '1'}
+        session.save()
+
+        self.client.get(reverse('cart.index'))
+        self.assertIsNone(self.cart_cookie())
+        self.assertEqual(
+            self.client.session[storage.SESSION_KEY],
+            {str(self.movies[0].id): '4', str(self.movies[1].id): '1'},
+        )
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.movies = create_movies(2)
+        self.user = User.objects.create(username='buyer')
+        self.state = State.objects.create(name='Georgia', abbreviation='GA', center_lat=33.0, center_lng=-83.0)
+        self.cart = {str(self.movies[0].id): '2', str(self.movies[1].id): '1'}
+
+    def purchase_counts(self):
+        return dict(MoviePopularity.objects.filter(state=self.state).values_list('movie_id', 'purchase_count'))
+
+    def test_event_is_written_with_the_order(self):
+        order = place_order(self.user, self.cart, self.state)
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.kind, OutboxEvent.ORDER_PLACED)
+        self.assertEqual(event.payload['order_id'], order.id)
+        self.assertIsNone(event.processed_at)
+        # Nothing is applied until the worker runs
+        self.assertEqual(self.purchase_counts(), {})
+
+    def test_order_is_rolled_back_when_the_event_cannot_be_written(self):
+        with mock.patch.object(OutboxEvent.objects, 'create', side_effect=DatabaseError('disk full')):
+            with self.assertRaises(DatabaseError):
+                place_order(self.user, self.cart, self.state)
+        self.assertFalse(Order.objects.exists())
+
+    def test_processing_applies_counters_and_summary(self):
+        order = place_order(self.user, self.cart, self.state)
+        self.assertEqual(outbox.process_batch(), (1, 0))
+        self.assertEqual(self.purchase_counts(), {self.movies[0].id: 2, self.movies[1].id: 1})
+        summary = PurchaseSummary.objects.get(user=self.user)
+        self.assertEqual((summary.orders_count, summary.items_count, summary.total_spent), (1, 3, order.total))
+        self.assertIsNotNone(OutboxEvent.objects.get().processed_at)
+
+    def test_reprocessing_is_idempotent(self):
+        place_order(self.user, self.cart, self.state)
+        place_order(self.user, self.cart, self.state)
+        self.assertEqual(outbox.process_batch(batch_size=1), (1, 0))
+        self.assertEqual(outbox.process_batch(), (1, 0))
+        self.assertEqual(outbox.process_batch(), (0, 0))
+        self.assertEqual(self.purchase_counts(), {self.movies[0].id: 4, self.movies[1].id: 2})
+        self.assertEqual(PurchaseSummary.objects.get(user=self.user).orders_count, 2)
+
+    def test_failed_event_is_retried_later_and_applied_once(self):
+        place_order(self.user, self.cart, self.state)
+        with mock.patch('cart.outbox.increment_popularity', side_effect=DatabaseError('locked')):
+            with self.assertLogs('cart.outbox', 'ERROR'):
+                self.assertEqual(outbox.process_batch(), (0, 1))
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.attempts, 1)
+        self.assertIn('locked', event.last_error)
+        self.assertIsNone(event.processed_at)
+        self.assertGreater(event.available_at, timezone.now())
+        self.assertFalse(PurchaseSummary.objects.exists())
+        # Not due yet
+        self.assertEqual(outbox.process_batch(), (0, 0))
+
+        OutboxEvent.objects.update(available_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(outbox.process_batch(), (1, 0))
+        self.assertEqual(self.purchase_counts(), {self.movies[0].id: 2, self.movies[1].id: 1})
+        self.assertEqual(PurchaseSummary.objects.get(user=self.user).orders_count, 1)
+
+    def test_event_is_given_up_after_max_attempts(self):
+        place_order(self.user, self.cart, self.state)
+        OutboxEvent.objects.update(attempts=outbox.MAX_ATTEMPTS)
+        self.assertEqual(outbox.process_batch(), (0, 0))
+        self.assertIsNone(OutboxEvent.objects.get().processed_at)
+
+    def test_deleted_state_only_drops_the_counters(self):
+        place_order(self.user, self.cart, self.state)
+        self.state.delete()
+        self.assertEqual(outbox.process_batch(), (1, 0))
+        self.assertEqual(PurchaseSummary.objects.get(user=self.user).orders_count, 1)
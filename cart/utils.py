@@ -1,4 +1,5 @@
 def calculate_cart_total(cart, movies_in_cart):
+    """Sum price * quantity; cart maps str(movie id) -> quantity, movies need id and price"""
     total = 0
     for movie in movies_in_cart:
         quantity = cart[str(movie.id)]
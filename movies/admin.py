@@ -1,9 +1,14 @@
 from django.contrib import admin
-from .models import Movie, Review
+from .models import Movie, Review, ReviewReport
 
 class MovieAdmin(admin.ModelAdmin):
     ordering = ['name']
     search_fields = ['name']
 
 admin.site.register(Movie, MovieAdmin)
-admin.site.register(Review)
\ No newline at end of file
+class ReviewAdmin(admin.ModelAdmin):
+    list_display = ['id', 'movie', 'user', 'is_reported', 'is_hidden', 'report_count']
+    list_select_related = ['movie', 'user']
+
+admin.site.register(Review, ReviewAdmin)
+admin.site.register(ReviewReport)
\ No newline at end of file
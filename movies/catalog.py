@@ -0,0 +1,44 @@
+"""Version counters for the per-process indexes derived from the database.
+
+Every Movie save or delete bumps the catalog version (see movies.signals).
+Indexes that live in process memory remember the version they were built
+from and rebuild when it moves. The counters are kept in the default
+cache, so deployments with several worker processes need a shared cache
+backend. Other data sets (e.g. petitions) keep their own counter through
+data_version() and bump_data_version().
+"""
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = "movies:catalog_version"
+
+
+def _fresh_version():
+    # Seeded from the clock so a counter lost to eviction never restarts at
+    # a value an existing index was built from
+    return time.time_ns() // 1000
+
+
+def data_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_data_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), timeout=None)
+        return cache.get(key)
+
+
+def catalog_version():
+    return data_version(VERSION_KEY)
+
+
+def bump_catalog_version():
+    return bump_data_version(VERSION_KEY)
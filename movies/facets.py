@@ -0,0 +1,160 @@
+"""In-memory facet index for browsing the catalog.
+
+Every movie gets a position in catalog order (name, id). For each value of
+each facet the index keeps a bitset, stored as a Python int, with the bits
+of the movies that have that value. Filtering is OR within a facet and AND
+across facets, and facet counts are popcounts of the intersections, so a
+browse request does no GROUP BY queries at all.
+
+The index is built from one query and rebuilt lazily when the catalog
+version changes (see movies.catalog), i.e. after any Movie save or delete.
+"""
+import threading
+
+import numpy as np
+from .catalog import catalog_version
+from .models import Movie
+
+PAGE_SIZE = 24
+# Lower bounds of the price bands, in whole dollars
+PRICE_BANDS = (0, 10, 20, 30)
+FACETS = ("genre", "rating", "decade", "director", "price")
+FACET_LABELS = {
+    "genre": "Genre",
+    "rating": "Rating",
+    "decade": "Decade",
+    "director": "Director",
+    "price": "Price",
+}
+
+_current = {"version": None, "index": None}
+_lock = threading.Lock()
+
+
+def price_band(price):
+    return max((low for low in PRICE_BANDS if price >= low), default=PRICE_BANDS[0])
+
+
+def value_label(facet, value):
+    if facet == "decade":
+        return f"{value}s"
+    if facet == "price":
+        low = int(value)
+        higher = [band for band in PRICE_BANDS if band > low]
+        return f"${low}-{higher[0] - 1}" if higher else f"${low}+"
+    return value
+
+
+def _sort_key(facet, value):
+    if facet in ("decade", "price"):
+        return int(value)
+    return value.lower()
+
+
+class FacetIndex:
+    def __init__(self, rows):
+        """rows are (id, genre, rating, release_year, director, price) in catalog order"""
+        self.ids = []
+        self.bitsets = {facet: {} for facet in FACETS}
+        for position, (id, genre, rating, release_year, director, price) in enumerate(rows):
+            self.ids.append(id)
+            bit = 1 << position
+            values = (genre, rating, str(release_year // 10 * 10), director, str(price_band(price)))
+            for facet, value in zip(FACETS, values):
+                bitsets = self.bitsets[facet]
+                bitsets[value] = bitsets.get(value, 0) | bit
+        self.all = (1 << len(self.ids)) - 1
+
+    @classmethod
+    def build(cls):
+        rows = Movie.objects.order_by("name", "id").values_list(
+            "id", "genre", "rating", "release_year", "director", "price"
+        )
+        return cls(rows.iterator(chunk_size=10_000))
+
+    def clean(self, selected):
+        """Drop unknown facets and values from a {facet: values} selection"""
+        return {
+            facet: {value for value in values if value in self.bitsets[facet]}
+            for facet, values in selected.items()
+            if facet in self.bitsets and values
+        }
+
+    def _facet_mask(self, facet, values):
+        mask = 0
+        for value in values:
+            mask |= self.bitsets[facet].get(value, 0)
+        return mask
+
+    def match(self, selected, skip=None):
+        """Bitset of the movies matching every facet in `selected` but `skip`"""
+        bits = self.all
+        for facet, values in selected.items():
+            if facet != skip and values:
+                bits &= self._facet_mask(facet, values)
+        return bits
+
+    def counts(self, selected):
+        """{facet: {value: count}} for the current selection.
+
+        A facet's own selection is ignored when counting its values, so the
+        counts show how many results each additional choice would give.
+        """
+        counts = {}
+        for facet in FACETS:
+            others = self.match(selected, skip=facet)
+            counts[facet] = {
+                value: (bits & others).bit_count()
+                for value, bits in self.bitsets[facet].items()
+            }
+        return counts
+
+    def page(self, bits, page=1, page_size=PAGE_SIZE):
+        """Movie ids of one page of the matching set, in catalog order"""
+        if not bits:
+            return []
+        raw = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+        positions = np.flatnonzero(np.unpackbits(raw, bitorder="little"))
+        start = (page - 1) * page_size
+        return [self.ids[position] for position in positions[start:start + page_size].tolist()]
+
+
+def current_index():
+    """The facet index for the current catalog version, rebuilt if stale"""
+    version = catalog_version()
+    if _current["version"] != version:
+        with _lock:
+            if _current["version"] != version:
+                _current["index"] = FacetIndex.build()
+                _current["version"] = version
+    return _current["index"]
+
+
+def browse(selected, page=1, page_size=PAGE_SIZE):
+    """Return (movie ids, total, facets) for a {facet: values} selection.
+
+    `facets` lists each facet with its values as dicts of value, label,
+    count and selected, ready for rendering.
+    """
+    index = current_index()
+    selected = index.clean(selected)
+    bits = index.match(selected)
+    counts = index.counts(selected)
+    facets = []
+    for facet in FACETS:
+        chosen = selected.get(facet, set())
+        values = sorted(index.bitsets[facet], key=lambda value: _sort_key(facet, value))
+        facets.append({
+            "name": facet,
+            "label": FACET_LABELS[facet],
+            "values": [
+                {
+                    "value": value,
+                    "label": value_label(facet, value),
+                    "count": counts[facet][value],
+                    "selected": value in chosen,
+                }
+                for value in values
+            ],
+        })
+    return index.page(bits, page, page_size), bits.bit_count(), facets
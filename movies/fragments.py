@@ -0,0 +1,66 @@
+"""Cached HTML fragments for listing pages.
+
+Catalog, browse and cart pages repeat the same markup for every movie, and
+the petition list for every petition. That markup does not depend on the
+visitor, so each fragment is rendered once and cached under its template,
+the object's key and a fragment generation. A page then fetches all of its
+fragments with one get_many and renders only the misses.
+
+Saving or deleting a Movie deletes that movie's fragments once the
+transaction commits (see movies.signals). Changes that affect every
+fragment, such as rebuilt image derivatives or a template edit, bump the
+generation instead, which leaves the old keys to expire.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+from .catalog import bump_data_version, data_version
+
+GENERATION_KEY = "movies:fragments:generation"
+TIMEOUT = 24 * 60 * 60
+MOVIE_CARD = "movies/fragments/movie_card.html"
+CART_ROW = "cart/fragments/cart_row.html"
+MOVIE_FRAGMENTS = (MOVIE_CARD, CART_ROW)
+
+
+def fragment_key(template_name, key, generation):
+    return f"fragment:{generation}:{template_name}:{key}"
+
+
+def render_fragments(template_name, objects, context_name, key=None, use_cache=True):
+    """[(object, html)] for objects, rendering `template_name` only on cache misses"""
+    key = key or (lambda obj: obj.id)
+    template = get_template(template_name)
+    objects = list(objects)
+    if not use_cache:
+        return [(obj, mark_safe(template.render({context_name: obj}))) for obj in objects]
+
+    generation = data_version(GENERATION_KEY)
+    keys = [fragment_key(template_name, key(obj), generation) for obj in objects]
+    cached = cache.get_many(keys)
+    missing = {}
+    fragments = []
+    for obj, cache_key in zip(objects, keys):
+        html = cached.get(cache_key)
+        if html is None:
+            html = missing[cache_key] = template.render({context_name: obj})
+        fragments.append((obj, mark_safe(html)))
+    if missing:
+        cache.set_many(missing, TIMEOUT)
+    return fragments
+
+
+def invalidate(template_name, keys):
+    generation = data_version(GENERATION_KEY)
+    cache.delete_many([fragment_key(template_name, key, generation) for key in keys])
+
+
+def invalidate_movie_on_commit(movie_id):
+    transaction.on_commit(
+        lambda: [invalidate(template_name, [movie_id]) for template_name in MOVIE_FRAGMENTS]
+    )
+
+
+def invalidate_all():
+    bump_data_version(GENERATION_KEY)
@@ -0,0 +1,205 @@
+"""Resized derivatives of the movie poster images.
+
+Originals live in MEDIA_ROOT/movie_images/. For each of them the pipeline
+writes JPEG and WebP copies in several widths, named after a hash of the
+original's content so they can be cached forever, plus a tiny inline
+placeholder. A JSON manifest maps each original filename to its
+derivatives; pages read it through image_sources() to emit srcset markup.
+"""
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+
+from django.conf import settings
+
+IMAGE_DIR = "movie_images"
+DERIVED_DIR = "movie_images/derived"
+MANIFEST_NAME = "manifest.json"
+WIDTHS = (200, 300, 400, 600)
+DEFAULT_WIDTH = 200
+PLACEHOLDER_WIDTH = 16
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+# How often readers look for a newer manifest on disk
+MANIFEST_CHECK_INTERVAL = 2.0
+
+logger = logging.getLogger(__name__)
+_manifest = {"entries": {}, "mtime": None, "checked": 0.0}
+
+
+def source_path(image, media_root=None):
+    return os.path.join(media_root or settings.MEDIA_ROOT, IMAGE_DIR, image)
+
+
+def derived_root(media_root=None):
+    return os.path.join(media_root or settings.MEDIA_ROOT, DERIVED_DIR)
+
+
+def manifest_path(media_root=None):
+    return os.path.join(derived_root(media_root), MANIFEST_NAME)
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def derivative_name(image, digest, width, extension):
+    stem = os.path.splitext(image)[0].replace("/", "_")
+    return f"{stem}-{digest}-{width}.{extension}"
+
+
+def build_derivatives(image, media_root, force=False):
+    """Write all derivatives of one original and return its manifest entry.
+
+    Runs in worker processes, so it only takes plain arguments and touches
+    nothing but the filesystem.
+    """
+    from PIL import Image, ImageOps
+
+    path = source_path(image, media_root)
+    digest = content_hash(path)
+    out_dir = derived_root(media_root)
+    os.makedirs(out_dir, exist_ok=True)
+
+    with Image.open(path) as original:
+        original = ImageOps.exif_transpose(original).convert("RGB")
+        width, height = original.size
+        # Never upscale; small originals get a single derivative at their own width
+        widths = [w for w in WIDTHS if w <= width] or [width]
+        for target in widths:
+            jpeg_name = derivative_name(image, digest, target, "jpg")
+            webp_name = derivative_name(image, digest, target, "webp")
+            if (not force and os.path.exists(os.path.join(out_dir, jpeg_name))
+                    and os.path.exists(os.path.join(out_dir, webp_name))):
+                continue
+            resized = original.resize(
+                (target, max(1, round(height * target / width))), Image.LANCZOS
+            )
+            _save_atomic(resized, os.path.join(out_dir, jpeg_name), "JPEG",
+                         quality=JPEG_QUALITY, optimize=True, progressive=True)
+            _save_atomic(resized, os.path.join(out_dir, webp_name), "WEBP",
+                         quality=WEBP_QUALITY, method=4)
+
+        tiny = original.resize(
+            (PLACEHOLDER_WIDTH, max(1, round(height * PLACEHOLDER_WIDTH / width))),
+            Image.BILINEAR,
+        )
+        buffer = io.BytesIO()
+        tiny.save(buffer, "JPEG", quality=40)
+
+    return {
+        "hash": digest,
+        "width": width,
+        "height": height,
+        "widths": widths,
+        "placeholder": "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode(),
+    }
+
+
+def _save_atomic(image, path, format, **options):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    image.save(tmp_path, format, **options)
+    os.replace(tmp_path, path)
+
+
+def read_manifest(media_root=None):
+    try:
+        with open(manifest_path(media_root)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def update_manifest(entries, media_root=None, replace=False):
+    """Merge entries into the manifest on disk and return the result"""
+    manifest = {} if replace else read_manifest(media_root)
+    manifest.update(entries)
+    path = manifest_path(media_root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, sort_keys=True)
+    os.replace(tmp_path, path)
+    _manifest["checked"] = 0.0
+    return manifest
+
+
+def manifest_entries():
+    """The manifest as last read by this process, refreshed when it changes"""
+    now = time.monotonic()
+    if now - _manifest["checked"] >= MANIFEST_CHECK_INTERVAL:
+        _manifest["checked"] = now
+        try:
+            mtime = os.stat(manifest_path()).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != _manifest["mtime"]:
+            _manifest["entries"] = read_manifest() if mtime else {}
+            _manifest["mtime"] = mtime
+    return _manifest["entries"]
+
+
+def has_derivatives(image):
+    return image in manifest_entries()
+
+
+def original_url(image):
+    return f"{settings.MEDIA_URL}{IMAGE_DIR}/{image}"
+
+
+def image_sources(image, width=DEFAULT_WIDTH):
+    """URLs for rendering `image` at roughly `width` CSS pixels.
+
+    Returns a dict with src, srcset, webp_srcset and placeholder keys. Images
+    without derivatives fall back to the original file and empty srcsets.
+    """
+    if not image:
+        return {"src": None, "srcset": "", "webp_srcset": "", "placeholder": ""}
+    entry = manifest_entries().get(image)
+    if entry is None:
+        return {"src": original_url(image), "srcset": "", "webp_srcset": "", "placeholder": ""}
+
+    base = f"{settings.MEDIA_URL}{DERIVED_DIR}/"
+    widths = entry["widths"]
+    # Smallest derivative at least as wide as requested, else the largest one
+    src_width = next((w for w in widths if w >= width), widths[-1])
+
+    def srcset(extension):
+        return ", ".join(
+            f"{base}{derivative_name(image, entry['hash'], w, extension)} {w}w"
+            for w in widths
+        )
+
+    return {
+        "src": base + derivative_name(image, entry["hash"], src_width, "jpg"),
+        "srcset": srcset("jpg"),
+        "webp_srcset": srcset("webp"),
+        "placeholder": entry["placeholder"],
+    }
+
+
+def image_fields(image, width=DEFAULT_WIDTH):
+    """image_url / image_srcset keys for the JSON APIs"""
+    sources = image_sources(image, width)
+    return {"image_url": sources["src"], "image_srcset": sources["srcset"]}
+
+
+def refresh_image(image):
+    """Build derivatives for one image in-process and record them"""
+    if not image or not os.path.isfile(source_path(image)):
+        return None
+    try:
+        entry = build_derivatives(image, settings.MEDIA_ROOT)
+    except Exception:
+        logger.exception("Could not build derivatives for %s", image)
+        return None
+    update_manifest({image: entry})
+    return entry
@@ -0,0 +1,103 @@
+"""Streaming catalog import from CSV or JSON Lines files.
+
+Records are read lazily and handled in fixed-size chunks: each chunk is
+validated field by field with the Movie model fields, its image files are
+checked on a thread pool, and the valid rows are upserted with one
+bulk_create(update_conflicts=True). Memory use depends on the chunk size,
+not the file size.
+
+Records with an id update that movie (or create it with that id); records
+without one always create a new movie. Columns missing from a record take
+the model default.
+"""
+import csv
+import json
+import os
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from . import images
+from .models import Movie
+
+IMPORT_FIELDS = ("id", "name", "price", "description", "image",
+                 "release_year", "director", "genre", "rating")
+BATCH_SIZE = 1000
+
+
+def detect_format(path):
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_records(path, format=None):
+    """Yield (line number, dict) pairs; malformed JSON lines yield an error string"""
+    format = format or detect_format(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if format == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, f"invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_number, "expected a JSON object"
+                continue
+            yield line_number, record
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def validate(record):
+    """Return (field values, error message) for one input record"""
+    values = {}
+    for name in IMPORT_FIELDS:
+        raw = record.get(name)
+        if isinstance(raw, str):
+            raw = raw.strip()
+        if raw in (None, ""):
+            if name == "id":
+                continue
+            field = Movie._meta.get_field(name)
+            if not field.has_default():
+                return None, f"{name} is required"
+            raw = field.get_default()
+        try:
+            values[name] = Movie._meta.get_field(name).clean(raw, None)
+        except ValidationError as e:
+            return None, f"{name}: {' '.join(e.messages)}"
+    if values["price"] < 0:
+        return None, "price: must not be negative"
+    return values, None
+
+
+def missing_images(names, pool):
+    """The subset of image names without a file in MEDIA_ROOT/movie_images"""
+    names = sorted(names)
+    found = pool.map(lambda name: os.path.isfile(images.source_path(name)), names)
+    return {name for name, exists in zip(names, found) if not exists}
+
+
+def upsert(rows):
+    """Insert or update one chunk of validated rows; returns the movie ids.
+
+    Ids of new rows are None on databases that cannot return them.
+    """
+    with transaction.atomic():
+        movies = Movie.objects.bulk_create(
+            [Movie(**row) for row in rows],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=[name for name in IMPORT_FIELDS if name != "id"],
+        )
+    return [movie.id for movie in movies]
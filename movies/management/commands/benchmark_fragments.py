@@ -0,0 +1,105 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.utils import timezone
+from cart.storage import SessionCartStorage
+from cart.utils import calculate_cart_total
+from movies import fragments
+from movies.snapshot import MovieRecord
+from petitions.cards import PETITION_CARD, card_key
+from petitions.models import Petition
+
+# Synthetic ids start far above real ones so their cached fragments never
+# shadow real cards in a shared cache
+FIRST_ID = 1_000_000_000
+
+
+class Command(BaseCommand):
+    help = 'Time listing page renders with and without the fragment cache (no database access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1000,
+                            help='Movies, cart rows or petitions per page')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.items, self.repeat = options['items'], options['repeat']
+        self.request = RequestFactory().get('/')
+        self.request.user = AnonymousUser()
+
+        for page, render_page in (
+            ('catalog', self.render_catalog),
+            ('cart', self.render_cart),
+            ('petitions', self.render_petitions),
+        ):
+            uncached = self.best(lambda run: render_page(self.first_id(run), use_cache=False))
+            cold = self.best(lambda run: render_page(self.first_id(run), use_cache=True))
+            warm_id = self.first_id(self.repeat)
+            render_page(warm_id, use_cache=True)
+            warm = self.best(lambda run: render_page(warm_id, use_cache=True))
+            self.stdout.write(
+                f'{page:>10} ({self.items} items): uncached {uncached:7.1f} ms'
+                f'   cold cache {cold:7.1f} ms   warm cache {warm:7.1f} ms'
+            )
+
+    def first_id(self, run):
+        # A fresh id range per run keeps "cold" cold
+        return FIRST_ID + run * self.items
+
+    def best(self, render):
+        timings = []
+        for run in range(self.repeat):
+            started = time.perf_counter()
+            render(run)
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings)
+
+    def movies(self, first_id):
+        return [
+            MovieRecord(id, f'Benchmark Movie {id}', 10 + id % 20, 'movie_images/default.jpg', 'Drama', 'PG')
+            for id in range(first_id, first_id + self.items)
+        ]
+
+    def render_catalog(self, first_id, use_cache):
+        movie_cards = [
+            (movie, card, 0) for movie, card in fragments.render_fragments(
+                fragments.MOVIE_CARD, self.movies(first_id), 'movie', use_cache=use_cache
+            )
+        ]
+        template_data = {'title': 'Movies', 'movie_cards': movie_cards}
+        return render_to_string('movies/index.html', {'template_data': template_data}, self.request)
+
+    def render_cart(self, first_id, use_cache):
+        movies = self.movies(first_id)
+        cart = {str(movie.id): '1' for movie in movies}
+        self.request.session = {'cart': cart}
+        template_data = {
+            'title': 'Cart',
+            'movies_in_cart': movies,
+            'cart_rows': fragments.render_fragments(fragments.CART_ROW, movies, 'movie', use_cache=use_cache),
+            'cart_total': calculate_cart_total(cart, movies),
+            'cart': SessionCartStorage(self.request),
+            'also_bought': [],
+        }
+        return render_to_string('cart/index.html', {'template_data': template_data}, self.request)
+
+    def render_petitions(self, first_id, use_cache):
+        author = User(username='benchmark')
+        now = timezone.now()
+        petitions = [
+            Petition(id=id, title=f'Add movie {id}', movie_title=f'Movie {id}',
+                     description='Please add this movie to the store. ' * 5,
+                     created_by=author, created_at=now, votes_count=id % 50)
+            for id in range(first_id, first_id + self.items)
+        ]
+        template_data = {
+            'title': 'Movie Petitions',
+            'petition_cards': fragments.render_fragments(
+                PETITION_CARD, petitions, 'petition', key=card_key, use_cache=use_cache
+            ),
+            'status_choices': Petition.STATUS_CHOICES,
+        }
+        return render_to_string('petitions/index.html', {'template_data': template_data}, self.request)
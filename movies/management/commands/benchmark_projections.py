@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from movies import projections
+from movies.models import Movie
+
+ALL_FIELDS = tuple(field.attname for field in Movie._meta.concrete_fields)
+
+
+class Command(BaseCommand):
+    help = ('Compare full-row and projected reads of list queries on a synthetic catalog '
+            '(rows are inserted in a transaction that is rolled back)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movies', type=int, default=20_000)
+        parser.add_argument('--description-size', type=int, default=2_000,
+                            help='Characters per synthetic description')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        sentence = 'Lorem ipsum dolor sit amet. '
+        description = (sentence * (options['description_size'] // len(sentence) + 1))[:options['description_size']]
+        with transaction.atomic():
+            started = time.perf_counter()
+            created = Movie.objects.bulk_create(
+                Movie(name=f'Benchmark Movie {n:06d}', price=10 + n % 20,
+                      image=f'movie_images/{n}.jpg', description=description)
+                for n in range(options['movies'])
+            )
+            ids = [movie.id for movie in created]
+            self.stdout.write(f'Inserted {len(ids):,} movies in {time.perf_counter() - started:.1f}s')
+
+            synthetic = Movie.objects.filter(id__gte=min(ids))
+            cases = (
+                ('catalog page', 'card', synthetic.order_by('name', 'id')[:24]),
+                ('search page', 'card', synthetic.filter(name__icontains='7').order_by('name', 'id')[:25]),
+                ('cart (50)', 'price', synthetic.filter(id__in=ids[::len(ids) // 50 or 1][:50])),
+                ('full scan', 'card', synthetic.order_by('id')),
+            )
+            self.stdout.write(f'{"query":>14} {"projection":>10} {"rows":>7} '
+                              f'{"full KB":>10} {"lean KB":>10} {"full ms":>9} {"lean ms":>9}')
+            for label, projection, queryset in cases:
+                columns = projections.fields(projection)
+                full_bytes, rows = self.measure(queryset.values_list(*ALL_FIELDS))
+                lean_bytes, _ = self.measure(queryset.values_list(*columns))
+                full_ms = self.best(lambda: list(queryset.all()))
+                lean_ms = self.best(lambda: list(queryset.only(*columns)))
+                self.stdout.write(
+                    f'{label:>14} {projection:>10} {rows:>7,} {full_bytes / 1e3:>10,.1f} '
+                    f'{lean_bytes / 1e3:>10,.1f} {full_ms:>9.1f} {lean_ms:>9.1f}'
+                )
+            transaction.set_rollback(True)
+
+    def measure(self, rows):
+        """(bytes, rows) of the values a query returns, as text"""
+        total = count = 0
+        for row in rows.iterator():
+            count += 1
+            total += sum(len(str(value).encode()) for value in row)
+        return total, count
+
+    def best(self, run):
+        timings = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings)
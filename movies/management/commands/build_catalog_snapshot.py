@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+from movies import snapshot
+
+
+class Command(BaseCommand):
+    help = 'Write the memory-mapped catalog snapshot read by the web workers'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = snapshot.write_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {count} movies to {snapshot.snapshot_path()} in {time.monotonic() - started:.2f}s.'
+        ))
@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from movies.models import Movie
+from movies import fragments, images
+
+
+class Command(BaseCommand):
+    help = 'Generate resized JPEG/WebP derivatives and placeholders for movie images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Number of worker processes')
+        parser.add_argument('--force', action='store_true',
+                            help='Re-encode derivatives that already exist')
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete derivative files no longer listed in the manifest')
+
+    def handle(self, *args, **options):
+        media_root = settings.MEDIA_ROOT
+        names = sorted(set(Movie.objects.exclude(image='').values_list('image', flat=True)))
+        # Workers only touch the filesystem; don't hand them an open connection
+        connections.close_all()
+
+        present = [name for name in names if os.path.isfile(images.source_path(name, media_root))]
+        if len(present) < len(names):
+            self.stdout.write(
+                self.style.WARNING(f'{len(names) - len(present)} referenced images are missing on disk')
+            )
+
+        previous = images.read_manifest(media_root)
+        entries = {}
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {
+                pool.submit(images.build_derivatives, name, media_root, options['force']): name
+                for name in present
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    entries[name] = future.result()
+                except Exception as e:
+                    self.stderr.write(f'Failed to process {name}: {e}')
+                    if name in previous:
+                        entries[name] = previous[name]
+
+        manifest = images.update_manifest(entries, media_root, replace=True)
+        self.stdout.write(f'Processed {len(entries)} images')
+        # Cached movie cards embed the old srcsets
+        fragments.invalidate_all()
+
+        if options['prune']:
+            self.prune(media_root, manifest)
+
+        self.stdout.write(self.style.SUCCESS('Image derivatives are up to date.'))
+
+    def prune(self, media_root, manifest):
+        """Remove derivatives of replaced or unreferenced originals"""
+        keep = {images.MANIFEST_NAME}
+        for name, entry in manifest.items():
+            for width in entry['widths']:
+                for extension in ('jpg', 'webp'):
+                    keep.add(images.derivative_name(name, entry['hash'], width, extension))
+
+        removed = 0
+        out_dir = images.derived_root(media_root)
+        for filename in os.listdir(out_dir):
+            if filename not in keep and not filename.endswith('.tmp'):
+                os.remove(os.path.join(out_dir, filename))
+                removed += 1
+        self.stdout.write(f'Pruned {removed} stale derivative files')
@@ -0,0 +1,109 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from movies import fragments, importer, publishing, search, snapshot
+from movies.catalog import bump_catalog_version
+
+# Invalid rows reported individually before the rest are only counted
+MAX_REPORTED_ERRORS = 20
+# Seconds between progress lines
+PROGRESS_INTERVAL = 5.0
+
+
+class Command(BaseCommand):
+    help = 'Import or update movies from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row, or a .jsonl file')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (default: guessed from the extension)')
+        parser.add_argument('--batch-size', type=int, default=importer.BATCH_SIZE,
+                            help='Rows validated and upserted per statement batch')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Threads used to check image files')
+        parser.add_argument('--skip-missing-images', action='store_true',
+                            help='Reject rows whose image file does not exist')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate the file without writing anything')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        try:
+            records = importer.read_records(options['path'], options['format'])
+            self.errors = 0
+            imported = missing = 0
+            imported_ids = []
+            started = reported = time.monotonic()
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                for chunk in importer.chunks(records, options['batch_size']):
+                    rows = []
+                    for line_number, record in chunk:
+                        if isinstance(record, str):
+                            self.reject(line_number, record)
+                            continue
+                        values, error = importer.validate(record)
+                        if error:
+                            self.reject(line_number, error)
+                            continue
+                        rows.append((line_number, values))
+
+                    absent = importer.missing_images({values['image'] for _, values in rows}, pool)
+                    if absent:
+                        missing += sum(1 for _, values in rows if values['image'] in absent)
+                        if options['skip_missing_images']:
+                            for line_number, values in rows:
+                                if values['image'] in absent:
+                                    self.reject(line_number, f'image {values["image"]} not found')
+                            rows = [(n, values) for n, values in rows if values['image'] not in absent]
+
+                    if rows and not options['dry_run']:
+                        ids = importer.upsert([values for _, values in rows])
+                        imported += len(ids)
+                        imported_ids.extend(ids)
+                    elif rows:
+                        imported += len(rows)
+                    now = time.monotonic()
+                    if now - reported >= PROGRESS_INTERVAL:
+                        reported = now
+                        self.stdout.write(
+                            f'{imported} rows imported, {self.errors} rejected '
+                            f'({imported / (now - started):.0f} rows/s)'
+                        )
+        except OSError as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+
+        elapsed = time.monotonic() - started
+        if missing:
+            self.stdout.write(self.style.WARNING(f'{missing} rows reference missing image files'))
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Dry run: {imported} valid rows, {self.errors} rejected in {elapsed:.1f}s'
+            ))
+            return
+
+        # bulk_create skips the Movie signals, so refresh what they maintain
+        if imported:
+            search.rebuild_index()
+            bump_catalog_version()
+            fragments.invalidate_all()
+            snapshot.write_snapshot()
+            if publishing.enabled():
+                # Re-render the changed pages and the index; everything if
+                # the database could not report the ids of new rows
+                ids = [] if None in imported_ids else [str(id) for id in imported_ids]
+                call_command('publish_pages', *ids, stdout=self.stdout, stderr=self.stderr)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} movies in {elapsed:.1f}s '
+            f'({imported / max(elapsed, 1e-9):.0f} rows/s), {self.errors} rows rejected. '
+            f'Run build_image_derivatives to resize new images.'
+        ))
+
+    def reject(self, line_number, message):
+        self.errors += 1
+        if self.errors <= MAX_REPORTED_ERRORS:
+            self.stderr.write(f'Line {line_number}: {message}')
+        elif self.errors == MAX_REPORTED_ERRORS + 1:
+            self.stderr.write('Further invalid rows are counted but not listed')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from movies import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from the Movie table'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write(
+                self.style.WARNING('Full-text search is not available on this database; nothing to rebuild.')
+            )
+            return
+
+        count = search.rebuild_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {count} movies for search.')
+        )
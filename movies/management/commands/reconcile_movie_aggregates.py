@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from movies.models import Movie
+from movies import ratings, reviews
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized rating aggregates, top rated scores and review counts stored on Movie'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of movies written per bulk update')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = list(ratings.AGGREGATE_FIELDS) + ['review_count', 'bayes_score']
+        computed = ratings.computed_aggregates()
+        for movie_id, count in reviews.computed_review_counts().items():
+            computed.setdefault(movie_id, dict.fromkeys(ratings.AGGREGATE_FIELDS, 0))
+            computed[movie_id]['review_count'] = count
+        for aggregates in computed.values():
+            aggregates['bayes_score'] = ratings.bayes_score(
+                aggregates['ratings_sum'], aggregates['ratings_count']
+            )
+        empty = {**dict.fromkeys(fields, 0), 'bayes_score': None}
+
+        checked = 0
+        corrected = 0
+        stale = []
+        for movie in Movie.objects.only('id', *fields).iterator(chunk_size=batch_size):
+            checked += 1
+            expected = {**empty, **computed.get(movie.id, {})}
+            if all(getattr(movie, field) == expected[field] for field in fields):
+                continue
+            for field in fields:
+                setattr(movie, field, expected[field])
+            stale.append(movie)
+            if len(stale) >= batch_size:
+                Movie.objects.bulk_update(stale, fields)
+                corrected += len(stale)
+                stale = []
+
+        if stale:
+            Movie.objects.bulk_update(stale, fields)
+            corrected += len(stale)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Checked {checked} movies, corrected {corrected}.')
+        )
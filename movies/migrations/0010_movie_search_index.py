@@ -0,0 +1,39 @@
+from django.db import migrations, OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    """Create and fill the FTS5 table on SQLite builds that ship FTS5"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from movies import search
+
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            search.create_index(cursor)
+        except OperationalError:
+            return
+        columns = ', '.join(search.INDEXED_FIELDS)
+        cursor.execute(
+            f'INSERT INTO {search.FTS_TABLE} (rowid, {columns}) '
+            f'SELECT id, {columns} FROM movies_movie'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from movies import search
+
+    with schema_editor.connection.cursor() as cursor:
+        search.drop_index(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0009_movie_image_charfield'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:29
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_review_counts(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    Review = apps.get_model('movies', 'Review')
+    counts = (
+        Review.objects.filter(is_reported=False).order_by()
+        .values('movie').annotate(count=Count('id'))
+    )
+    for row in counts:
+        Movie.objects.filter(id=row['movie']).update(review_count=row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0012_movie_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='review_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movie', 'is_reported', '-date', '-id'], name='review_feed_idx'),
+        ),
+        migrations.RunPython(backfill_review_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_report_counts(apps, schema_editor):
+    # Reporters were not recorded before; count each existing report once
+    Review = apps.get_model('movies', 'Review')
+    Review.objects.filter(is_reported=True).update(report_count=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0013_review_feed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewReport',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='is_hidden',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='report_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('is_hidden', False), ('is_reported', True)), fields=['-report_count', '-id'], name='review_moderation_idx'),
+        ),
+        migrations.AddField(
+            model_name='reviewreport',
+            name='review',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reports', to='movies.review'),
+        ),
+        migrations.AddField(
+            model_name='reviewreport',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='reviewreport',
+            unique_together={('review', 'user')},
+        ),
+        migrations.RunPython(backfill_report_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_bayes_scores(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    mean = float(getattr(settings, 'RATING_PRIOR_MEAN', 3.0))
+    weight = float(getattr(settings, 'RATING_PRIOR_WEIGHT', 10))
+    Movie.objects.filter(ratings_count__gt=0).update(
+        bayes_score=(mean * weight + F('ratings_sum')) / (weight + F('ratings_count'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0014_review_moderation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='bayes_score',
+            field=models.FloatField(blank=True, default=None, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('bayes_score__isnull', False)), fields=['-bayes_score', 'id'], name='movie_top_rated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('bayes_score__isnull', False)), fields=['genre', '-bayes_score', 'id'], name='movie_genre_top_rated_idx'),
+        ),
+        migrations.RunPython(backfill_bayes_scores, migrations.RunPython.noop),
+    ]
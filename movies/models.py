@@ -12,10 +12,45 @@ class Movie(models.Model):
     director = models.CharField(max_length=100, default="Unknown")  # <-- ADD THIS LINE
     genre = models.CharField(max_length=50, default="Action")  # <-- ADD THIS LINE
     rating = models.CharField(max_length=10, default="PG")  # <-- ADD THIS LINE
+    # Star rating aggregates, kept exact by movies.ratings on every submit
+    ratings_count = models.IntegerField(default=0)
+    ratings_sum = models.IntegerField(default=0)
+    ratings_1 = models.IntegerField(default=0)
+    ratings_2 = models.IntegerField(default=0)
+    ratings_3 = models.IntegerField(default=0)
+    ratings_4 = models.IntegerField(default=0)
+    ratings_5 = models.IntegerField(default=0)
+    # Bayesian average of the ratings, None until the first rating (see movies.ratings)
+    bayes_score = models.FloatField(null=True, blank=True, default=None)
+    # Number of visible (unreported) reviews, kept by movies.reviews
+    review_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the catalog walks (name, id)
+            models.Index(fields=["name", "id"], name="movie_name_id_idx"),
+            # Top rated listings, overall and per genre, over rated movies only
+            models.Index(
+                fields=["-bayes_score", "id"],
+                name="movie_top_rated_idx",
+                condition=models.Q(bayes_score__isnull=False),
+            ),
+            models.Index(
+                fields=["genre", "-bayes_score", "id"],
+                name="movie_genre_top_rated_idx",
+                condition=models.Q(bayes_score__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return str(self.id) + " - " + self.name
 
+    @property
+    def average_rating(self):
+        if not self.ratings_count:
+            return 0
+        return round(self.ratings_sum / self.ratings_count, 2)
+
 
 class Review(models.Model):
     id = models.AutoField(primary_key=True)
@@ -24,11 +59,39 @@ class Review(models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     is_reported = models.BooleanField(default=False)
+    # A moderator confirmed the report; the review stays hidden and leaves the queue
+    is_hidden = models.BooleanField(default=False)
+    report_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Newest-first review feed of a movie, see movies.reviews
+            models.Index(fields=["movie", "is_reported", "-date", "-id"], name="review_feed_idx"),
+            # Moderation queue; only reported, unresolved reviews are indexed
+            models.Index(
+                fields=["-report_count", "-id"],
+                name="review_moderation_idx",
+                condition=models.Q(is_reported=True, is_hidden=False),
+            ),
+        ]
 
     def __str__(self):
         return str(self.id) + " - " + self.movie.name
 
 
+class ReviewReport(models.Model):
+    id = models.AutoField(primary_key=True)
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name="reports")
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("review", "user")  # One report per user per review
+
+    def __str__(self):
+        return f"{self.user.username} reported review {self.review_id}"
+
+
 class Rating(models.Model):
     id = models.AutoField(primary_key=True)
     rating = models.IntegerField(choices=[(i, i) for i in range(1, 6)])  # 1-5 star rating
@@ -0,0 +1,80 @@
+"""Keyset (cursor) pagination helpers.
+
+A page is described by the ordering columns of its last row, packed into an
+opaque URL-safe token. Fetching the next page is then an indexed range scan
+instead of an OFFSET that grows with the page number.
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 24
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keeps the microseconds DjangoJSONEncoder drops, so rows stamped
+    within the same millisecond as the page boundary are not skipped"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    # Datetimes come back as ISO strings, which the ordering field parses
+    raw = json.dumps(list(values), cls=CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, size):
+    """Return the cursor values, or None if the token is malformed"""
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def _after(ordering, values):
+    """Build the row-value comparison (a, b) > (x, y) as a Q object"""
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        clause = Q(**{f"{name}__{lookup}": values[position]})
+        for previous, value in zip(ordering[:position], values[:position]):
+            clause &= Q(**{previous.lstrip("-"): value})
+        condition |= clause
+    return condition
+
+
+def keyset_page(queryset, ordering, after=None, page_size=DEFAULT_PAGE_SIZE):
+    """Return (rows, next_token) for the page that follows the `after` token.
+
+    `ordering` must end with a unique column (usually the primary key) so
+    that every row has a distinct position.
+    """
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(after, len(ordering))
+    if values is not None:
+        queryset = queryset.filter(_after(ordering, values))
+
+    rows = list(queryset[:page_size + 1])
+    next_token = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_token = encode_cursor(
+            getattr(last, field.lstrip("-")) for field in ordering
+        )
+    return rows, next_token
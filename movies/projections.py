@@ -0,0 +1,34 @@
+"""Named column sets for list queries on Movie.
+
+Movie.description is by far the widest column and only the detail page
+shows it, yet a plain Movie.objects query reads it for every row. List
+views load one of these projections instead: with only() when they need
+model instances, with values_list() when tuples will do.
+
+    Movie.objects.only(*projections.fields("card"))
+    Item.objects.select_related("movie").only(*projections.fields("price", "movie"), ...)
+
+Adding a column to a template that lists movies means adding it to the
+projection that view uses; reading a deferred column still works but
+costs one query per row.
+"""
+PROJECTIONS = {
+    # Title indexes (typeahead, trigrams) and links such as the moderation queue
+    "title": ("id", "name"),
+    # Catalog, browse and search cards: see movies/fragments/movie_card.html
+    "card": ("id", "name", "image"),
+    # Cart totals, order lines and moderation rows
+    "price": ("id", "name", "price"),
+    # Recommendation and API listings that show a card with its price
+    "listing": ("id", "name", "image", "price"),
+    # Top rated listings
+    "ranked": ("id", "name", "image", "genre", "bayes_score", "ratings_count", "ratings_sum"),
+}
+
+
+def fields(name, related=None):
+    """Column names of a projection, prefixed for a related Movie if `related` is given"""
+    columns = PROJECTIONS[name]
+    if related:
+        return tuple(f"{related}__{column}" for column in columns)
+    return columns
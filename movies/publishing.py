@@ -0,0 +1,140 @@
+"""Pre-rendered HTML for anonymous visitors.
+
+With PUBLISH_PAGES on, the catalog's first page and every movie detail
+page are rendered ahead of time into PUBLISHED_PAGES_DIR. Anonymous GET
+requests without query parameters are answered from those files, with no
+template rendering and no queries. Signed-in users and paged or searched
+views are rendered as usual.
+
+Pages are rendered without a request, as an anonymous visitor would see
+them. The CSRF token is left as a placeholder that the serving view fills
+in per request. The rating widget fetches the live rating summary from the
+batch endpoint, so published pages stay correct as ratings come in.
+
+publish_pages renders everything on a process pool. After that, Movie and
+Review changes re-render only the pages they affect, once the transaction
+commits.
+"""
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import render_to_string
+
+CSRF_PLACEHOLDER = "__published_csrf_token__"
+INDEX_PAGE = "index"
+
+logger = logging.getLogger(__name__)
+_pending = threading.local()
+
+
+def enabled():
+    return getattr(settings, "PUBLISH_PAGES", False)
+
+
+def page_path(name):
+    return os.path.join(settings.PUBLISHED_PAGES_DIR, "movies", f"{name}.html")
+
+
+def render_movie_page(movie):
+    from .views import movie_page_data
+
+    template_data = movie_page_data(movie)
+    template_data["rating_state"]["refresh"] = True
+    return render_to_string(
+        "movies/show.html",
+        {"template_data": template_data, "csrf_token": CSRF_PLACEHOLDER},
+    )
+
+
+def render_index_page():
+    from .views import catalog_index_data
+
+    return render_to_string(
+        "movies/index.html",
+        {"template_data": catalog_index_data(), "csrf_token": CSRF_PLACEHOLDER},
+    )
+
+
+def write_page(name, html):
+    path = page_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(tmp_path, path)
+
+
+def remove_page(name):
+    try:
+        os.remove(page_path(name))
+    except FileNotFoundError:
+        pass
+
+
+def read_page(name):
+    """Published HTML of a page, or None if it has not been rendered"""
+    try:
+        with open(page_path(name), encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def publish_movies(movie_ids):
+    """Render the detail pages of movie_ids; pages of deleted movies are removed"""
+    from .models import Movie
+
+    movie_ids = set(movie_ids)
+    published = 0
+    for movie in Movie.objects.filter(id__in=movie_ids):
+        write_page(movie.id, render_movie_page(movie))
+        movie_ids.discard(movie.id)
+        published += 1
+    for movie_id in movie_ids:
+        remove_page(movie_id)
+    return published
+
+
+def publish_index():
+    write_page(INDEX_PAGE, render_index_page())
+
+
+def republish_on_commit(movie_ids=(), index=False):
+    """Re-render the given pages after the current transaction commits.
+
+    Requests from one transaction are collected and rendered together.
+    """
+    if not enabled():
+        return
+    if not hasattr(_pending, "movie_ids"):
+        _pending.movie_ids, _pending.index = set(), False
+    _pending.movie_ids.update(movie_ids)
+    _pending.index = _pending.index or index
+    transaction.on_commit(_publish_pending)
+
+
+def _publish_pending():
+    movie_ids, index = getattr(_pending, "movie_ids", set()), getattr(_pending, "index", False)
+    _pending.movie_ids, _pending.index = set(), False
+    try:
+        if movie_ids:
+            publish_movies(movie_ids)
+        if index:
+            publish_index()
+    except Exception:
+        # A failed render leaves the previous file in place; publish_pages repairs it
+        logger.exception("Could not republish pages for movies %s", sorted(movie_ids))
+
+
+def neighbors_of(movie_id):
+    """Movies whose "also bought" list on the detail page can show movie_id"""
+    from recommendations.copurchase import ALSO_BOUGHT_LIMIT
+    from recommendations.models import MovieNeighbor
+
+    # A single-movie list reads ranks below limit + 1, see also_bought()
+    return MovieNeighbor.objects.filter(
+        neighbor_id=movie_id, rank__lt=ALSO_BOUGHT_LIMIT + 1
+    ).values_list("movie_id", flat=True)
@@ -0,0 +1,84 @@
+"""Per-user maps of movie id -> own star rating, cached in packed form.
+
+Showing the viewer's stars next to every card would otherwise cost a
+Rating query per page (or per movie). Instead each user's ratings are
+loaded once with one query and cached as a packed byte string: the sorted
+movie ids as unsigned 32-bit integers followed by one byte of stars per
+movie, i.e. 5 bytes per rating. Lookups bisect the id array.
+
+Writes through movies.ratings and deleted ratings (the Rating signal
+handler) drop the cached map once the transaction commits, and the next
+read rebuilds it with its single query. Dropping rather than patching the
+map means two commits for the same user cannot overwrite each other's
+change. A map loaded while a write was committing can still miss that
+write; TIMEOUT bounds how long such a map is served.
+
+The map lives in the default cache, so with several worker processes that
+cache must be shared (see CACHES in settings): with a per-process cache a
+write only drops the copy of the process that made it.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import transaction
+from .models import Rating
+
+CACHE_KEY = "movies:rating_map:{user_id}"
+TIMEOUT = 60 * 60
+
+
+class RatingMap:
+    def __init__(self, ids=(), stars=()):
+        self.ids = array("I", ids)
+        self.stars = bytearray(stars)
+
+    @classmethod
+    def from_bytes(cls, data):
+        count = len(data) // 5
+        rating_map = cls()
+        rating_map.ids.frombytes(data[:count * 4])
+        rating_map.stars = bytearray(data[count * 4:])
+        return rating_map
+
+    def to_bytes(self):
+        return self.ids.tobytes() + bytes(self.stars)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _position(self, movie_id):
+        position = bisect_left(self.ids, movie_id)
+        if position < len(self.ids) and self.ids[position] == movie_id:
+            return position
+        return None
+
+    def get(self, movie_id, default=0):
+        position = self._position(movie_id)
+        return default if position is None else self.stars[position]
+
+    def movie_ids(self):
+        return set(self.ids)
+
+
+def rating_map(user):
+    """The user's RatingMap, from the cache or one query; empty for anonymous users"""
+    if not user.is_authenticated:
+        return RatingMap()
+    key = CACHE_KEY.format(user_id=user.id)
+    data = cache.get(key)
+    if data is not None:
+        return RatingMap.from_bytes(data)
+    rows = list(
+        Rating.objects.filter(user_id=user.id).order_by("movie_id").values_list("movie_id", "rating")
+    )
+    ids, stars = zip(*rows) if rows else ((), ())
+    loaded = RatingMap(ids, stars)
+    cache.add(key, loaded.to_bytes(), TIMEOUT)
+    return loaded
+
+
+def invalidate_on_commit(user_id):
+    """Drop the user's cached map once the current transaction commits"""
+    key = CACHE_KEY.format(user_id=user_id)
+    transaction.on_commit(lambda: cache.delete(key))
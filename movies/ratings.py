@@ -0,0 +1,198 @@
+"""Star ratings and the per-movie aggregates derived from them.
+
+Movie carries a denormalized count, sum and 1-5 star histogram of its
+ratings. Every write path goes through this module so the aggregates stay
+exact without re-reading the Rating table. Batches of ratings (see
+apply_ratings) cost the same handful of queries as a single one.
+
+The same writes keep bayes_score, the Bayesian average of the ratings: the
+mean after adding RATING_PRIOR_WEIGHT virtual ratings of RATING_PRIOR_MEAN
+stars, so a movie with one five-star rating does not outrank one with
+hundreds of mostly good ones. The top rated listings read it through
+partial indexes on (-bayes_score, id) and (genre, -bayes_score, id).
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Q, Sum, Value, When
+from . import projections, rating_maps
+from .models import Movie, Rating
+from .pagination import keyset_page
+
+STARS = range(1, 6)
+STAR_FIELDS = {stars: f"ratings_{stars}" for stars in STARS}
+AGGREGATE_FIELDS = ("ratings_count", "ratings_sum") + tuple(STAR_FIELDS.values())
+TOP_RATED_ORDERING = ("-bayes_score", "id")
+TOP_RATED_PAGE_SIZE = 24
+
+
+def prior():
+    """(mean, weight) of the Bayesian prior"""
+    return (
+        float(getattr(settings, "RATING_PRIOR_MEAN", 3.0)),
+        float(getattr(settings, "RATING_PRIOR_WEIGHT", 10)),
+    )
+
+
+def bayes_score(ratings_sum, ratings_count):
+    """Average pulled toward the prior mean; None for an unrated movie"""
+    if not ratings_count:
+        return None
+    mean, weight = prior()
+    return (mean * weight + ratings_sum) / (weight + ratings_count)
+
+
+def bayes_score_expression(ratings_sum, ratings_count):
+    """bayes_score() in SQL, over expressions for the new sum and count"""
+    mean, weight = prior()
+    return ExpressionWrapper(
+        (Value(mean * weight) + ratings_sum) / (Value(weight) + ratings_count),
+        output_field=FloatField(),
+    )
+
+
+def rate_movie(user, movie_id, stars):
+    """Create or update the user's rating and adjust the movie aggregates"""
+    apply_ratings(user, {movie_id: stars})
+
+
+def apply_ratings(user, stars_by_movie):
+    """Create or update many of the user's ratings at once.
+
+    stars_by_movie maps movie id -> stars (validated by the caller). The
+    ratings are written with one multi-row upsert and the aggregates of
+    every affected movie with one UPDATE, whatever the number of movies.
+    Returns the number of ratings that changed.
+    """
+    movie_ids = list(stars_by_movie)
+    with transaction.atomic():
+        # Serialize concurrent submits for the same movies on backends that
+        # support row locks. SQLite ignores FOR UPDATE: this transaction
+        # starts deferred, so a concurrent writer makes the first write below
+        # fail with "database is locked" instead of waiting. Set the SQLite
+        # "transaction_mode": "IMMEDIATE" database option (Django 5.1+) to
+        # make writers queue up instead.
+        list(Movie.objects.select_for_update().filter(id__in=movie_ids).order_by("id").values_list("id"))
+        previous = dict(
+            Rating.objects.filter(user=user, movie_id__in=movie_ids).values_list("movie_id", "rating")
+        )
+        Rating.objects.bulk_create(
+            [Rating(user=user, movie_id=movie_id, rating=stars) for movie_id, stars in stars_by_movie.items()],
+            update_conflicts=True,
+            unique_fields=["user", "movie"],
+            update_fields=["rating"],
+        )
+        rating_maps.invalidate_on_commit(user.id)
+
+        deltas = {}
+        for movie_id, stars in stars_by_movie.items():
+            old = previous.get(movie_id)
+            if old == stars:
+                continue
+            delta = {"ratings_sum": stars - (old or 0), STAR_FIELDS[stars]: 1}
+            if old is None:
+                delta["ratings_count"] = 1
+            else:
+                delta[STAR_FIELDS[old]] = -1
+            deltas[movie_id] = delta
+        if deltas:
+            Movie.objects.filter(id__in=deltas).update(**aggregate_changes(deltas))
+    return len(deltas)
+
+
+def aggregate_changes(deltas):
+    """update() kwargs applying per-movie {field: delta} maps in one statement"""
+    changes = {}
+    for field in AGGREGATE_FIELDS:
+        whens = [
+            When(id=movie_id, then=F(field) + delta[field])
+            for movie_id, delta in deltas.items() if delta.get(field)
+        ]
+        if whens:
+            changes[field] = Case(*whens, default=F(field))
+    # Every F() in an UPDATE reads the old row, so apply the deltas here too
+    changes["bayes_score"] = Case(
+        *[
+            When(id=movie_id, then=bayes_score_expression(
+                F("ratings_sum") + delta.get("ratings_sum", 0),
+                F("ratings_count") + delta.get("ratings_count", 0),
+            ))
+            for movie_id, delta in deltas.items()
+        ],
+        default=F("bayes_score"),
+        output_field=FloatField(),
+    )
+    return changes
+
+
+def forget_rating(movie_id, stars):
+    """Remove one deleted rating from the movie aggregates"""
+    Movie.objects.filter(id=movie_id).update(
+        ratings_count=F("ratings_count") - 1,
+        ratings_sum=F("ratings_sum") - stars,
+        bayes_score=Case(
+            When(ratings_count__lte=1, then=Value(None)),
+            default=bayes_score_expression(F("ratings_sum") - stars, F("ratings_count") - 1),
+            output_field=FloatField(),
+        ),
+        **{STAR_FIELDS[stars]: F(STAR_FIELDS[stars]) - 1},
+    )
+
+
+def summarize(row):
+    """Build the rating_summary payload from a Movie or a values() dict"""
+    if not isinstance(row, dict):
+        row = {field: getattr(row, field) for field in AGGREGATE_FIELDS}
+    count = row["ratings_count"]
+    return {
+        "average_rating": round(row["ratings_sum"] / count, 2) if count else 0,
+        "total_ratings": count,
+        "rating_distribution": {
+            str(stars): row[field] for stars, field in STAR_FIELDS.items()
+        },
+    }
+
+
+def top_rated_page(genre=None, after=None, page_size=TOP_RATED_PAGE_SIZE):
+    """Return (movies, next_token) of rated movies, best Bayesian average first"""
+    movies = Movie.objects.filter(bayes_score__isnull=False)
+    if genre:
+        movies = movies.filter(genre=genre)
+    return keyset_page(
+        movies.only(*projections.fields("ranked")),
+        TOP_RATED_ORDERING,
+        after=after,
+        page_size=page_size,
+    )
+
+
+def computed_aggregates():
+    """Recompute the aggregates of every rated movie with one grouped query"""
+    annotations = {
+        "ratings_count": Count("id"),
+        "ratings_sum": Sum("rating"),
+    }
+    for stars, field in STAR_FIELDS.items():
+        annotations[field] = Count("id", filter=Q(rating=stars))
+    return {
+        row.pop("movie"): row
+        for row in Rating.objects.order_by().values("movie").annotate(**annotations)
+    }
+
+
+def user_ratings(user, movie_ids):
+    """Map movie id -> the user's stars for the rated subset of movie_ids"""
+    own = rating_maps.rating_map(user)
+    stars = {int(movie_id): own.get(int(movie_id)) for movie_id in movie_ids}
+    return {movie_id: rated for movie_id, rated in stars.items() if rated}
+
+
+def rating_states(movie_ids, user):
+    """Summaries plus the viewer's own rating for many movies in two queries"""
+    rows = Movie.objects.filter(id__in=movie_ids).values("id", *AGGREGATE_FIELDS)
+    own = user_ratings(user, movie_ids)
+    states = {}
+    for row in rows:
+        state = summarize(row)
+        state["user_rating"] = own.get(row["id"], 0)
+        states[row["id"]] = state
+    return states
@@ -0,0 +1,144 @@
+"""The public review feed of a movie, its cached review count, and moderation.
+
+Movie.review_count holds the number of visible (unreported) reviews. It is
+adjusted by the Review signal handlers and by report(), so pages can show
+totals without a COUNT(*).
+
+A report hides the review at once and puts it in the moderation queue,
+which is served from a partial index over reported, unresolved reviews.
+Moderators resolve queued reviews in bulk; each action is a fixed number
+of set-based statements no matter how many reviews it covers.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from . import projections, publishing
+from .models import Movie, Review, ReviewReport
+from .pagination import keyset_page
+
+FEED_ORDERING = ("-date", "-id")
+FEED_PAGE_SIZE = 10
+MODERATION_ORDERING = ("-report_count", "-id")
+MODERATION_PAGE_SIZE = 50
+
+
+def visible_reviews(movie_id):
+    return Review.objects.filter(movie_id=movie_id, is_reported=False)
+
+
+def feed_page(movie_id, after=None, page_size=FEED_PAGE_SIZE):
+    """Return (reviews, next_token), newest first, with authors joined"""
+    return keyset_page(
+        visible_reviews(movie_id).select_related("user"),
+        FEED_ORDERING,
+        after=after,
+        page_size=page_size,
+    )
+
+
+def adjust_review_count(movie_id, delta):
+    Movie.objects.filter(id=movie_id).update(review_count=F("review_count") + delta)
+
+
+def report(review, user):
+    """Record user's report and hide the review from the feed.
+
+    Returns False if user had already reported the review.
+    """
+    _, created = ReviewReport.objects.get_or_create(review=review, user=user)
+    if not created:
+        return False
+    Review.objects.filter(id=review.id).update(report_count=F("report_count") + 1)
+    hidden = Review.objects.filter(id=review.id, is_reported=False).update(is_reported=True)
+    if hidden:
+        adjust_review_count(review.movie_id, -1)
+        # A queryset update sends no signals, so republish here
+        publishing.republish_on_commit([review.movie_id])
+    return True
+
+
+def moderation_queue():
+    """Reported reviews waiting for a moderator, matching review_moderation_idx"""
+    return Review.objects.filter(is_reported=True, is_hidden=False)
+
+
+def moderation_page(after=None, page_size=MODERATION_PAGE_SIZE):
+    """Return (reviews, next_token), most reported first"""
+    return keyset_page(
+        moderation_queue().select_related("movie", "user").only(
+            "comment", "date", "report_count", "user__username", *projections.fields("title", "movie")
+        ),
+        MODERATION_ORDERING,
+        after=after,
+        page_size=page_size,
+    )
+
+
+def hide_reviews(queued):
+    """Keep the queued reviews hidden for good; returns the number resolved"""
+    return queued.update(is_hidden=True)
+
+
+def restore_reviews(queued):
+    """Put the queued reviews back in their feeds and clear their reports"""
+    with transaction.atomic():
+        movie_ids = list(queued.order_by().values_list("movie_id", flat=True).distinct())
+        ReviewReport.objects.filter(review__in=queued).delete()
+        restored = queued.update(is_reported=False, report_count=0)
+        recount_reviews(movie_ids)
+        publishing.republish_on_commit(movie_ids)
+    return restored
+
+
+def delete_reviews(queued):
+    """Delete the queued reviews and their reports"""
+    queued = queued.order_by()
+    with transaction.atomic():
+        movie_ids = list(queued.values_list("movie_id", flat=True).distinct())
+        ReviewReport.objects.filter(review__in=queued).delete()
+        # QuerySet.delete() would load every row to send post_delete. Queued
+        # reviews are already out of the feeds and the counts, so the only
+        # thing those handlers do is republish, done once here; the reviews
+        # go in a single DELETE ... WHERE id IN (subquery).
+        subquery, params = queued.values("id").query.sql_with_params()
+        table = connection.ops.quote_name(Review._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({subquery})", params)
+            deleted = cursor.rowcount
+        publishing.republish_on_commit(movie_ids)
+    return deleted
+
+
+MODERATION_ACTIONS = {
+    "hide": hide_reviews,
+    "restore": restore_reviews,
+    "delete": delete_reviews,
+}
+
+
+def moderate(action, review_ids=None):
+    """Apply a moderation action to the queued review_ids, or to the whole queue"""
+    queued = moderation_queue()
+    if review_ids is not None:
+        queued = queued.filter(id__in=review_ids)
+    return MODERATION_ACTIONS[action](queued)
+
+
+def recount_reviews(movie_ids):
+    """Recompute review_count of movie_ids in one UPDATE with a correlated subquery"""
+    visible = (
+        Review.objects.filter(movie=OuterRef("pk"), is_reported=False).order_by()
+        .values("movie").annotate(count=Count("id")).values("count")
+    )
+    Movie.objects.filter(id__in=movie_ids).update(
+        review_count=Coalesce(Subquery(visible), Value(0))
+    )
+
+
+def computed_review_counts():
+    """Visible review count of every reviewed movie, from one grouped query"""
+    return dict(
+        Review.objects.filter(is_reported=False).order_by()
+        .values("movie").annotate(count=Count("id"))
+        .values_list("movie", "count")
+    )
@@ -0,0 +1,122 @@
+"""Ranked full-text search over the movie catalog.
+
+On SQLite the searchable Movie columns are mirrored into an FTS5 virtual
+table that is kept in sync by the signal handlers in movies.signals and can
+be rebuilt with `manage.py rebuild_search_index`. Other database backends
+fall back to a case-insensitive match on the movie name.
+"""
+import re
+
+from django.db import connection, OperationalError
+from . import projections
+from .models import Movie
+
+FTS_TABLE = "movies_movie_fts"
+INDEXED_FIELDS = ("name", "description", "director", "genre")
+# bm25() column weights, in the same order as INDEXED_FIELDS
+COLUMN_WEIGHTS = (10.0, 1.0, 4.0, 2.0)
+PAGE_SIZE = 24
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_available = {}
+
+
+def create_index(cursor):
+    """Create the FTS5 table; raises OperationalError if FTS5 is missing"""
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{', '.join(INDEXED_FIELDS)}, "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+
+
+def drop_index(cursor):
+    cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def is_available():
+    """True when the current database has the FTS5 search table"""
+    if connection.vendor != "sqlite":
+        return False
+    key = connection.settings_dict["NAME"]
+    if key not in _available:
+        _available[key] = FTS_TABLE in connection.introspection.table_names()
+    return _available[key]
+
+
+def index_movie(movie):
+    """Insert or refresh a single movie in the search index"""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [movie.id])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(INDEXED_FIELDS)}) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            [movie.id] + [getattr(movie, field) or "" for field in INDEXED_FIELDS],
+        )
+
+
+def remove_movie(movie_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [movie_id])
+
+
+def rebuild_index():
+    """Repopulate the search index from the Movie table in one pass"""
+    if not is_available():
+        return 0
+    columns = ", ".join(INDEXED_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, {columns}) "
+            f"SELECT id, {columns} FROM {Movie._meta.db_table}"
+        )
+        count = cursor.rowcount
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return count
+
+
+def build_match_query(search_term):
+    """Turn free text into an FTS5 query where every word is a prefix match"""
+    tokens = _TOKEN_RE.findall(search_term.lower())
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search_ids(search_term, limit=PAGE_SIZE, offset=0):
+    """Return BM25-ranked movie ids for search_term"""
+    match = build_match_query(search_term)
+    if not match:
+        return []
+    weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS)
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s OFFSET %s",
+                [match, limit, offset],
+            )
+        except OperationalError:
+            return []
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_movies(search_term, page=1, page_size=PAGE_SIZE):
+    """Return (movies, has_next) for one page of search results"""
+    offset = (page - 1) * page_size
+    if not is_available():
+        movies = list(
+            Movie.objects.filter(name__icontains=search_term).only(*projections.fields("card"))
+            .order_by("name", "id")[offset:offset + page_size + 1]
+        )
+        return movies[:page_size], len(movies) > page_size
+
+    # Fetch one extra id to know whether another page exists
+    ids = search_ids(search_term, limit=page_size + 1, offset=offset)
+    has_next = len(ids) > page_size
+    ids = ids[:page_size]
+    movies_by_id = Movie.objects.only(*projections.fields("card")).in_bulk(ids)
+    return [movies_by_id[id] for id in ids if id in movies_by_id], has_next
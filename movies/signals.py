@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Movie, Rating, Review
+from . import fragments, images, publishing, rating_maps, ratings, reviews, search, snapshot, typeahead
+from .catalog import bump_catalog_version
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved(sender, instance, raw=False, **kwargs):
+    """Keep the search index in sync with the catalog"""
+    if raw:
+        return
+    search.index_movie(instance)
+    movie_id, name = instance.id, instance.name
+    transaction.on_commit(lambda: catalog_changed(movie_id, name))
+    snapshot.rebuild_on_commit()
+    fragments.invalidate_movie_on_commit(movie_id)
+    if publishing.enabled():
+        publishing.republish_on_commit([movie_id, *publishing.neighbors_of(movie_id)], index=True)
+    if instance.image and not images.has_derivatives(instance.image):
+        transaction.on_commit(lambda: refresh_image(movie_id, instance.image))
+
+
+@receiver(post_delete, sender=Movie)
+def movie_deleted(sender, instance, **kwargs):
+    search.remove_movie(instance.id)
+    movie_id = instance.id
+    transaction.on_commit(lambda: catalog_changed(movie_id, None))
+    snapshot.rebuild_on_commit()
+    fragments.invalidate_movie_on_commit(movie_id)
+    publishing.republish_on_commit([movie_id], index=True)
+
+
+def refresh_image(movie_id, image):
+    """Build the image's derivatives, then drop cards rendered without them"""
+    if images.refresh_image(image):
+        fragments.invalidate(fragments.MOVIE_CARD, [movie_id])
+
+
+def catalog_changed(movie_id, name):
+    """Invalidate catalog indexes everywhere and patch this process's typeahead"""
+    typeahead.apply_change(movie_id, name, bump_catalog_version())
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    """Keep the movie's rating aggregates exact when a rating goes away"""
+    ratings.forget_rating(instance.movie_id, instance.rating)
+    rating_maps.invalidate_on_commit(instance.user_id)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created and not instance.is_reported:
+        reviews.adjust_review_count(instance.movie_id, 1)
+    publishing.republish_on_commit([instance.movie_id])
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    if not instance.is_reported:
+        reviews.adjust_review_count(instance.movie_id, -1)
+    publishing.republish_on_commit([instance.movie_id])
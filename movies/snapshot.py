@@ -0,0 +1,232 @@
+"""Read-only catalog snapshot shared by every worker through mmap.
+
+The fields that listings, the cart and the regions APIs need (name, price,
+image, genre, rating) are written to one file as fixed-width columns plus a
+table of deduplicated UTF-8 strings:
+
+    header   magic, catalog version, row count, string table size
+    ids      int64[n], sorted
+    prices   int64[n]
+    for each string column: offsets uint32[n], lengths uint32[n]
+    strings  bytes
+
+Readers map the file and wrap the columns in memoryviews, so lookups are a
+bisect over the id column with no ORM objects and no per-process copy; the
+page cache holds a single copy for all workers.
+
+The process that changes a Movie rewrites the file on a background thread
+REBUILD_DELAY seconds after the transaction commits, so a save costs the
+request nothing and a burst of edits shares one rewrite. The new file is
+swapped in with os.replace(); other processes notice the new inode within
+CHECK_INTERVAL seconds and remap. Ids missing from the snapshot are read
+from the database. Until the rewrite lands, listings may show the old
+values, so prices that are charged (the cart, checkout) are always read
+from the database.
+"""
+import atexit
+import bisect
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from .catalog import catalog_version
+from .models import Movie
+
+MAGIC = b"MVSNAP01"
+HEADER = struct.Struct("<8sQQQ")
+STRING_FIELDS = ("name", "image", "genre", "rating")
+FIELDS = ("id", "name", "price", "image", "genre", "rating")
+# How often readers look for a newer snapshot file
+CHECK_INTERVAL = 1.0
+# Movie changes within this many seconds share one rewrite
+REBUILD_DELAY = 2.0
+
+MovieRecord = namedtuple("MovieRecord", FIELDS)
+
+logger = logging.getLogger(__name__)
+_current = {"snapshot": None, "stat": None, "checked": 0.0, "rebuild_pending": False}
+_lock = threading.Lock()
+
+
+def snapshot_path():
+    return settings.CATALOG_SNAPSHOT_PATH
+
+
+class Snapshot:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, count, strings_size = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        view = memoryview(self._map)
+        position = HEADER.size
+
+        def column(code, size):
+            nonlocal position
+            start, position = position, position + size * count
+            return view[start:position].cast(code)
+
+        self.ids = column("q", 8)
+        self.prices = column("q", 8)
+        self.strings = {name: (column("I", 4), column("I", 4)) for name in STRING_FIELDS}
+        self.table = view[position:position + strings_size]
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def _string(self, name, index):
+        offsets, lengths = self.strings[name]
+        start = offsets[index]
+        return str(self.table[start:start + lengths[index]], "utf-8")
+
+    def get(self, movie_id):
+        """The MovieRecord for movie_id, or None if the snapshot lacks it"""
+        index = bisect.bisect_left(self.ids, movie_id)
+        if index == self.count or self.ids[index] != movie_id:
+            return None
+        return MovieRecord(
+            movie_id,
+            self._string("name", index),
+            self.prices[index],
+            self._string("image", index),
+            self._string("genre", index),
+            self._string("rating", index),
+        )
+
+
+def write_snapshot(path=None):
+    """Write a snapshot of the whole catalog and return the row count"""
+    path = path or snapshot_path()
+    version = catalog_version()
+    ids, prices = array("q"), array("q")
+    offsets = {name: array("I") for name in STRING_FIELDS}
+    lengths = {name: array("I") for name in STRING_FIELDS}
+    table = bytearray()
+    interned = {}
+    rows = Movie.objects.order_by("id").values_list(*FIELDS)
+    for row in rows.iterator(chunk_size=10_000):
+        record = MovieRecord(*row)
+        ids.append(record.id)
+        prices.append(record.price)
+        for name in STRING_FIELDS:
+            value = getattr(record, name)
+            if value not in interned:
+                encoded = value.encode()
+                interned[value] = (len(table), len(encoded))
+                table += encoded
+            start, length = interned[value]
+            offsets[name].append(start)
+            lengths[name].append(length)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, version, len(ids), len(table)))
+        f.write(ids.tobytes())
+        f.write(prices.tobytes())
+        for name in STRING_FIELDS:
+            f.write(offsets[name].tobytes())
+            f.write(lengths[name].tobytes())
+        f.write(table)
+    os.replace(tmp_path, path)
+    _current["checked"] = 0.0
+    return len(ids)
+
+
+def current_snapshot():
+    """The mapped snapshot, remapped when the file changes; None if unavailable"""
+    now = time.monotonic()
+    if now - _current["checked"] < CHECK_INTERVAL:
+        return _current["snapshot"]
+    with _lock:
+        _current["checked"] = now
+        path = snapshot_path()
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stat = _rebuild(path)
+        except OSError:
+            stat = None
+        if stat is None:
+            _current["snapshot"], _current["stat"] = None, None
+        elif (stat.st_ino, stat.st_mtime_ns) != _current["stat"]:
+            try:
+                _current["snapshot"] = Snapshot(path)
+                _current["stat"] = (stat.st_ino, stat.st_mtime_ns)
+            except (OSError, ValueError):
+                logger.exception("Could not map the catalog snapshot %s", path)
+                _current["snapshot"], _current["stat"] = None, None
+    return _current["snapshot"]
+
+
+def _rebuild(path):
+    try:
+        write_snapshot(path)
+        return os.stat(path)
+    except Exception:
+        logger.exception("Could not write the catalog snapshot %s", path)
+        return None
+
+
+def get(movie_id):
+    return records([movie_id]).get(int(movie_id))
+
+
+def records(movie_ids):
+    """{id: MovieRecord} for the given ids; ids not in the catalog are left out"""
+    snapshot = current_snapshot()
+    found = {}
+    missing = []
+    for movie_id in {int(id) for id in movie_ids}:
+        record = snapshot.get(movie_id) if snapshot is not None else None
+        if record is None:
+            missing.append(movie_id)
+        else:
+            found[movie_id] = record
+    if missing:
+        # Created after the snapshot was written (or no snapshot at all)
+        for row in Movie.objects.filter(id__in=missing).values_list(*FIELDS):
+            found[row[0]] = MovieRecord(*row)
+    return found
+
+
+def rebuild_on_commit():
+    """Rewrite the snapshot in the background after the current transaction commits"""
+    transaction.on_commit(_schedule_rebuild)
+
+
+def _schedule_rebuild():
+    with _lock:
+        if _current["rebuild_pending"]:
+            return
+        _current["rebuild_pending"] = True
+    timer = threading.Timer(REBUILD_DELAY, _rebuild_pending)
+    timer.daemon = True
+    timer.start()
+
+
+def _rebuild_pending():
+    # Cleared before the rewrite reads the table, so a change committed
+    # while it runs schedules another one
+    with _lock:
+        if not _current["rebuild_pending"]:
+            return
+        _current["rebuild_pending"] = False
+    try:
+        _rebuild(snapshot_path())
+    finally:
+        # The timer thread owns its own connection; don't hold it open
+        connection.close()
+
+
+# Short-lived processes (management commands) exit before the timer fires
+atexit.register(_rebuild_pending)
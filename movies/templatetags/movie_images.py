@@ -0,0 +1,27 @@
+from django import template
+from django.utils.html import format_html
+from movies import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def movie_image(image, width=images.DEFAULT_WIDTH, sizes=None, css_class="", style=""):
+    """Render a <picture> with WebP and JPEG srcsets for a movie image"""
+    sources = images.image_sources(image, width)
+    sizes = sizes or f"{width}px"
+    if sources["placeholder"]:
+        style = f"{style} background: url({sources['placeholder']}) center / cover;"
+    if not sources["srcset"]:
+        return format_html(
+            '<img src="{}" class="{}" style="{}" loading="lazy" alt="">',
+            sources["src"] or "", css_class, style,
+        )
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" style="{}" loading="lazy" alt="">'
+        '</picture>',
+        sources["webp_srcset"], sizes,
+        sources["src"], sources["srcset"], sizes, css_class, style,
+    )
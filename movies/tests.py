@@ -1,3 +1,147 @@
-from django.test import TestCase
+import datetime
+import json
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from .models import Movie, Rating, Review
+from . import ratings
+from .pagination import decode_cursor, encode_cursor, keyset_page
+
+
+def create_movie(name, **fields):
+    fields.setdefault("price", 10)
+    fields.setdefault("description", "A movie")
+    return Movie.objects.create(name=name, **fields)
+
+
+@override_settings(RATING_PRIOR_MEAN=3.0, RATING_PRIOR_WEIGHT=10)
+class RatingAggregatesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create(username="alice")
+        self.bob = User.objects.create(username="bob")
+        self.movie = create_movie("Heat")
+        self.other = create_movie("Ronin")
+
+    def assertAggregatesMatchRatings(self, *movies):
+        computed = ratings.computed_aggregates()
+        for movie in movies:
+            movie.refresh_from_db()
+            expected = computed.get(movie.id, dict.fromkeys(ratings.AGGREGATE_FIELDS, 0))
+            for field in ratings.AGGREGATE_FIELDS:
+                self.assertEqual(getattr(movie, field), expected[field], field)
+            expected_score = ratings.bayes_score(movie.ratings_sum, movie.ratings_count)
+            if expected_score is None:
+                self.assertIsNone(movie.bayes_score)
+            else:
+                self.assertAlmostEqual(movie.bayes_score, expected_score)
+
+    def test_insert(self):
+        ratings.rate_movie(self.alice, self.movie.id, 5)
+        ratings.rate_movie(self.bob, self.movie.id, 2)
+        self.assertAggregatesMatchRatings(self.movie, self.other)
+        self.assertEqual(self.movie.ratings_count, 2)
+        self.assertEqual(self.movie.ratings_5, 1)
+        self.assertAlmostEqual(self.movie.bayes_score, (30 + 7) / 12)
+
+    def test_rerate_moves_the_rating_between_stars(self):
+        ratings.rate_movie(self.alice, self.movie.id, 5)
+        ratings.rate_movie(self.alice, self.movie.id, 1)
+        self.assertAggregatesMatchRatings(self.movie)
+        self.assertEqual(self.movie.ratings_count, 1)
+        self.assertEqual((self.movie.ratings_1, self.movie.ratings_5), (1, 0))
+
+    def test_rerate_with_same_stars_changes_nothing(self):
+        ratings.rate_movie(self.alice, self.movie.id, 4)
+        self.assertEqual(ratings.apply_ratings(self.alice, {self.movie.id: 4}), 0)
+        self.assertAggregatesMatchRatings(self.movie)
+
+    def test_delete(self):
+        ratings.rate_movie(self.alice, self.movie.id, 5)
+        ratings.rate_movie(self.bob, self.movie.id, 3)
+        Rating.objects.get(user=self.alice, movie=self.movie).delete()
+        self.assertAggregatesMatchRatings(self.movie)
+        self.assertEqual(self.movie.ratings_count, 1)
+
+    def test_deleting_the_last_rating_clears_bayes_score(self):
+        ratings.rate_movie(self.alice, self.movie.id, 5)
+        Rating.objects.get(user=self.alice, movie=self.movie).delete()
+        self.assertAggregatesMatchRatings(self.movie)
+        self.assertIsNone(self.movie.bayes_score)
+
+    def test_bulk_insert_and_rerate(self):
+        ratings.rate_movie(self.alice, self.movie.id, 2)
+        changed = ratings.apply_ratings(self.alice, {self.movie.id: 4, self.other.id: 5})
+        self.assertEqual(changed, 2)
+        self.assertAggregatesMatchRatings(self.movie, self.other)
+
+    def test_bulk_endpoint_keeps_the_last_rating_of_a_repeated_movie(self):
+        self.client.force_login(self.alice)
+        response = self.client.post(
+            reverse("movies.submit_ratings"),
+            json.dumps({"ratings": [
+                {"movie_id": self.movie.id, "rating": 1},
+                {"movie_id": self.other.id, "rating": 3},
+                {"movie_id": self.movie.id, "rating": 4},
+            ]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Rating.objects.get(user=self.alice, movie=self.movie).rating, 4)
+        self.assertAggregatesMatchRatings(self.movie, self.other)
+        self.assertEqual(self.movie.ratings_count, 1)
+
+    def test_bulk_endpoint_rejects_non_integer_ratings(self):
+        self.client.force_login(self.alice)
+        for value in (4.9, True, "4"):
+            response = self.client.post(
+                reverse("movies.submit_ratings"),
+                json.dumps({"ratings": [{"movie_id": self.movie.id, "rating": value}]}),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 400, value)
+        self.assertFalse(Rating.objects.exists())
+
+
+class KeysetPaginationTests(TestCase):
+    def walk(self, queryset, ordering, page_size):
+        seen, token = [], None
+        while True:
+            rows, token = keyset_page(queryset, ordering, after=token, page_size=page_size)
+            seen.extend(row.id for row in rows)
+            if token is None:
+                return seen
+
+    def test_ties_on_the_sort_key_are_broken_by_id(self):
+        movies = [create_movie(name) for name in ["B", "A", "B", "B", "A", "C", "B"]]
+        expected = [movie.id for movie in sorted(movies, key=lambda movie: (movie.name, movie.id))]
+        for page_size in (1, 2, 3):
+            self.assertEqual(self.walk(Movie.objects.all(), ("name", "id"), page_size), expected)
+
+    def test_datetime_cursor_keeps_microseconds(self):
+        user = User.objects.create(username="critic")
+        movie = create_movie("Heat")
+        moment = datetime.datetime(2025, 1, 1, 12, 0, 0, tzinfo=datetime.timezone.utc)
+        # Four reviews within one millisecond, plus one a millisecond earlier
+        for microsecond in (123456, 123400, 123001, 123000, 122000):
+            review = Review.objects.create(comment="Good", movie=movie, user=user)
+            Review.objects.filter(id=review.id).update(date=moment.replace(microsecond=microsecond))
+        expected = list(Review.objects.order_by("-date", "-id").values_list("id", flat=True))
+        self.assertEqual(len(expected), 5)
+        self.assertEqual(self.walk(Review.objects.all(), ("-date", "-id"), 1), expected)
+
+    def test_cursor_round_trip(self):
+        moment = datetime.datetime(2025, 1, 1, 12, 0, 0, 123456, tzinfo=datetime.timezone.utc)
+        token = encode_cursor([moment, "Heat", 7])
+        self.assertEqual(decode_cursor(token, 3), [moment.isoformat(), "Heat", 7])
+
+    def test_malformed_cursor_restarts_at_the_first_page(self):
+        for name in ["A", "B", "C"]:
+            create_movie(name)
+        first_page, _ = keyset_page(Movie.objects.all(), ("name", "id"), page_size=2)
+        for token in ["", "not base64!", "bm90IGpzb24", encode_cursor([1]), encode_cursor({"a": 1})]:
+            self.assertIsNone(decode_cursor(token, 2), token)
+            rows, _ = keyset_page(Movie.objects.all(), ("name", "id"), after=token, page_size=2)
+            self.assertEqual(rows, first_page)
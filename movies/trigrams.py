@@ -0,0 +1,147 @@
+"""Fuzzy title matching with an in-memory trigram index.
+
+Titles are normalized like the typeahead (movies.typeahead.normalize) and
+split into trigrams the way PostgreSQL's pg_trgm does: every word is
+padded with two spaces in front and one behind. Similarity is the Jaccard
+index of the two trigram sets, so "Dark Knight" and "The Dark Knight"
+score 0.75.
+
+Lookups use prefix filtering: a title can only reach the threshold if it
+shares one of the query's rarest trigrams, so only those posting lists are
+scanned and the candidates are then scored exactly.
+
+An index is rebuilt when its data version moves (see movies.catalog) and
+pickled to TRIGRAM_INDEX_DIR, so other processes and restarts load the
+file instead of re-reading the table.
+"""
+import logging
+import math
+import os
+import pickle
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from . import projections
+from .catalog import catalog_version
+from .typeahead import normalize
+
+DEFAULT_THRESHOLD = 0.3
+DEFAULT_LIMIT = 5
+
+logger = logging.getLogger(__name__)
+
+
+def trigrams(text):
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    shared = len(grams_a & grams_b)
+    return shared / (len(grams_a) + len(grams_b) - shared)
+
+
+class TrigramIndex:
+    """Similarity search over (id, text) rows loaded by `load_rows`"""
+
+    def __init__(self, name, load_rows, version=catalog_version):
+        self.name = name
+        self.load_rows = load_rows
+        self.version = version
+        self._lock = threading.Lock()
+        self._data = None
+
+    def path(self):
+        return os.path.join(settings.TRIGRAM_INDEX_DIR, f"{self.name}.pickle")
+
+    @staticmethod
+    def build(rows, version):
+        ids, texts, sizes, postings = [], [], [], {}
+        for id, text in rows:
+            grams = trigrams(text)
+            if not grams:
+                continue
+            position = len(ids)
+            ids.append(id)
+            texts.append(text)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        return {"version": version, "ids": ids, "texts": texts, "sizes": sizes, "postings": postings}
+
+    def data(self):
+        version = self.version()
+        data = self._data
+        if data is not None and data["version"] == version:
+            return data
+        with self._lock:
+            if self._data is None or self._data["version"] != version:
+                self._data = self._load(version) or self._rebuild(version)
+            return self._data
+
+    def _load(self, version):
+        try:
+            with open(self.path(), "rb") as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        return data if data.get("version") == version else None
+
+    def _rebuild(self, version):
+        data = self.build(self.load_rows(), version)
+        path = self.path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.exception("Could not persist the %s trigram index", self.name)
+        return data
+
+    def search(self, text, limit=DEFAULT_LIMIT, threshold=DEFAULT_THRESHOLD, exclude=()):
+        """[(id, text, similarity)] of the best matches at or above threshold"""
+        query = trigrams(text)
+        if not query:
+            return []
+        data = self.data()
+        postings = data["postings"]
+        # Jaccard >= t needs at least ceil(t * |query|) shared trigrams, so a
+        # match must contain one of the |query| - that + 1 rarest ones
+        needed = max(1, math.ceil(threshold * len(query)))
+        rare = sorted(query, key=lambda gram: len(postings.get(gram, ())))
+        candidates = set()
+        for gram in rare[:len(query) - needed + 1]:
+            candidates.update(postings.get(gram, ()))
+
+        matches = []
+        for position in candidates:
+            shared = sum(1 for gram in query if _contains(postings.get(gram, ()), position))
+            score = shared / (len(query) + data["sizes"][position] - shared)
+            if score >= threshold and data["ids"][position] not in exclude:
+                matches.append((data["ids"][position], data["texts"][position], score))
+        matches.sort(key=lambda match: (-match[2], match[1]))
+        return matches[:limit]
+
+
+def _contains(positions, position):
+    # Posting lists are built in position order, so membership is a bisect
+    index = bisect_left(positions, position)
+    return index < len(positions) and positions[index] == position
+
+
+def _movie_titles():
+    from .models import Movie
+
+    return Movie.objects.values_list(*projections.fields("title")).iterator(chunk_size=10_000)
+
+
+movie_titles = TrigramIndex("movies", _movie_titles)
@@ -0,0 +1,162 @@
+"""Title completions served from process memory.
+
+Titles are normalized (accents stripped, case folded, punctuation dropped)
+and stored as a sorted list of (key, movie id) entries: one for the whole
+title and one for every later word, so "knight" completes "The Dark
+Knight". A prefix lookup is a bisect into that list; matches are ranked by
+MoviePopularity activity, and the top results per prefix are memoized.
+
+The index is built from two queries and then kept current by the Movie
+signals of this process (apply_change). Other processes notice the bumped
+catalog version and rebuild; popularity is refreshed by a periodic rebuild.
+"""
+import bisect
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.db.models import F, Sum
+from . import projections
+from .catalog import catalog_version
+from .models import Movie
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# Rebuild at least this often so rankings follow popularity
+REFRESH_INTERVAL = 300.0
+PREFIX_CACHE_SIZE = 4096
+
+_current = {"index": None}
+_lock = threading.Lock()
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", text.casefold()))
+
+
+def title_keys(name):
+    """The whole normalized title and each suffix that starts at a word"""
+    words = normalize(name).split()
+    return {" ".join(words[start:]) for start in range(len(words))}
+
+
+def popularity_scores():
+    """{movie id: activity}, weighted like MoviePopularity.total_activity"""
+    from regions.models import MoviePopularity
+
+    rows = MoviePopularity.objects.values("movie_id").annotate(
+        score=Sum(F("purchase_count") * 10 + F("view_count"))
+    )
+    return {row["movie_id"]: row["score"] for row in rows}
+
+
+class TitleIndex:
+    def __init__(self, titles, scores, version=None):
+        """titles is {movie id: name}, scores is {movie id: popularity}"""
+        self.titles = dict(titles)
+        self.scores = scores
+        self.version = version
+        self.built = time.monotonic()
+        self.entries = sorted(
+            (key, id) for id, name in self.titles.items() for key in title_keys(name)
+        )
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, version=None):
+        titles = dict(Movie.objects.values_list(*projections.fields("title")).iterator(chunk_size=10_000))
+        return cls(titles, popularity_scores(), version)
+
+    def add(self, id, name):
+        with self._lock:
+            self._remove(id)
+            self.titles[id] = name
+            for key in title_keys(name):
+                bisect.insort(self.entries, (key, id))
+            self._cache.clear()
+
+    def remove(self, id):
+        with self._lock:
+            self._remove(id)
+            self._cache.clear()
+
+    def _remove(self, id):
+        name = self.titles.pop(id, None)
+        if name is None:
+            return
+        for key in title_keys(name):
+            position = bisect.bisect_left(self.entries, (key, id))
+            if position < len(self.entries) and self.entries[position] == (key, id):
+                del self.entries[position]
+
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        """[(movie id, title)] of the most popular titles matching prefix"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            best = self._cache.get(prefix)
+            if best is None:
+                best = self._lookup(prefix)
+                self._cache[prefix] = best
+                if len(self._cache) > PREFIX_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(prefix)
+        return best[:limit]
+
+    def _lookup(self, prefix):
+        matches = set()
+        position = bisect.bisect_left(self.entries, (prefix,))
+        while position < len(self.entries) and self.entries[position][0].startswith(prefix):
+            matches.add(self.entries[position][1])
+            position += 1
+        best = sorted(
+            matches, key=lambda id: (-self.scores.get(id, 0), self.titles[id].casefold(), id)
+        )[:MAX_LIMIT]
+        return [(id, self.titles[id]) for id in best]
+
+
+def _stale(index, version):
+    return (index is None or index.version != version
+            or time.monotonic() - index.built > REFRESH_INTERVAL)
+
+
+def current_index():
+    """The title index, rebuilt when stale or when another process changed the catalog"""
+    version = catalog_version()
+    index = _current["index"]
+    if _stale(index, version):
+        with _lock:
+            index = _current["index"]
+            if _stale(index, version):
+                index = TitleIndex.build(version)
+                _current["index"] = index
+    return index
+
+
+def complete(prefix, limit=DEFAULT_LIMIT):
+    return current_index().complete(prefix, min(limit, MAX_LIMIT))
+
+
+def apply_change(movie_id, name, version):
+    """Patch this process's index after a Movie save (name) or delete (None).
+
+    `version` is the catalog version the change produced. The index is only
+    patched if it was current right before; otherwise another change slipped
+    in between and the next lookup rebuilds from the database.
+    """
+    with _lock:
+        index = _current["index"]
+        if index is None or index.version != version - 1:
+            return
+        if name is None:
+            index.remove(movie_id)
+        else:
+            index.add(movie_id, name)
+        index.version = version
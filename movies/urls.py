@@ -3,7 +3,15 @@ from . import views
 
 urlpatterns = [
     path("", views.index, name="movies.index"),
+    path("browse/", views.browse, name="movies.browse"),
+    path("top-rated/", views.top_rated, name="movies.top_rated"),
+    path("suggest/", views.suggest, name="movies.suggest"),
+    path("catalog/", views.catalog_api, name="movies.catalog_api"),
+    path("ratings/", views.rating_states, name="movies.rating_states"),
+    path("ratings/bulk/", views.submit_ratings, name="movies.submit_ratings"),
+    path("moderation/", views.moderation, name="movies.moderation"),
     path("<int:id>/", views.show, name="movies.show"),
+    path("<int:id>/reviews/", views.review_feed, name="movies.review_feed"),
     path("<int:id>/review/create/", views.create_review, name="movies.create_review"),
     path(
         "<int:id>/review/<int:review_id>/edit/",
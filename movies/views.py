@@ -1,38 +1,199 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Movie, Review, Rating
+from django.urls import reverse
+from .models import Movie, Review
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from regions.models import State, MoviePopularity
+from regions.models import State
+from regions.counters import view_counter
+from recommendations.copurchase import also_bought
+from . import facets, fragments, images, projections, publishing, rating_maps, ratings, reviews, search, snapshot, trigrams, typeahead
+from .pagination import keyset_page
 import json
 
+CATALOG_ORDERING = ("name", "id")
+MAX_RATING_STATES = 100
+MAX_BULK_RATINGS = 100
+
 
 def index(request):
     search_term = request.GET.get("search")
+    if not request.GET and not request.user.is_authenticated and publishing.enabled():
+        response = published_response(request, publishing.INDEX_PAGE)
+        if response:
+            return response
+
+    template_data = {}
     if search_term:
-        movies = Movie.objects.filter(name__icontains=search_term)
+        try:
+            page = max(int(request.GET.get("page", 1)), 1)
+        except ValueError:
+            page = 1
+        movies, has_next = search.search_movies(search_term, page)
+        template_data["title"] = "Movies"
+        template_data["movie_cards"] = movie_cards(movies, request.user)
+        template_data["search_term"] = search_term
+        template_data["page"] = page
+        template_data["previous_page"] = page - 1 if page > 1 else None
+        template_data["next_page"] = page + 1 if has_next else None
+        if not movies and page == 1:
+            template_data["did_you_mean"] = [
+                name for _, name, _ in trigrams.movie_titles.search(search_term, limit=3)
+            ]
     else:
-        movies = Movie.objects.all()
+        template_data = catalog_index_data(request.GET.get("after"), request.user)
+    return render(request, "movies/index.html", {"template_data": template_data})
 
+
+def catalog_index_data(after=None, user=None):
+    """template_data of one unfiltered catalog page; user None renders the anonymous view"""
+    movies, next_token = catalog_page(after)
     template_data = {}
     template_data["title"] = "Movies"
+    template_data["movie_cards"] = movie_cards(movies, user)
+    template_data["after"] = after
+    template_data["next_token"] = next_token
+    return template_data
+
+
+def movie_cards(movies, user=None):
+    """[(movie, card html, the user's stars)]; cards come from movies.fragments"""
+    own = rating_maps.rating_map(user or AnonymousUser())
+    return [
+        (movie, card, own.get(movie.id))
+        for movie, card in fragments.render_fragments(fragments.MOVIE_CARD, movies, "movie")
+    ]
+
+
+def published_response(request, name):
+    """Serve a pre-rendered page (see movies.publishing), or None if missing"""
+    html = publishing.read_page(name)
+    if html is None:
+        return None
+    # get_token() also makes sure the CSRF cookie is set for the forms
+    return HttpResponse(html.replace(publishing.CSRF_PLACEHOLDER, get_token(request)))
+
+
+def catalog_page(after=None):
+    """One keyset page of the catalog, ordered by (name, id)"""
+    return keyset_page(
+        Movie.objects.only(*projections.fields("card")), CATALOG_ORDERING, after=after
+    )
+
+
+def catalog_api(request):
+    """JSON variant of the catalog listing for infinite-scroll clients"""
+    movies, next_token = catalog_page(request.GET.get("after"))
+    own = rating_maps.rating_map(request.user)
+    return JsonResponse({
+        "movies": [
+            {
+                "id": movie.id,
+                "name": movie.name,
+                **images.image_fields(movie.image),
+                "url": reverse("movies.show", args=[movie.id]),
+                "user_rating": own.get(movie.id),
+            }
+            for movie in movies
+        ],
+        "next": next_token,
+    })
+
+
+def suggest(request):
+    """Title completions for the search boxes, served from memory"""
+    try:
+        limit = int(request.GET.get("limit", typeahead.DEFAULT_LIMIT))
+    except ValueError:
+        limit = typeahead.DEFAULT_LIMIT
+    completions = typeahead.complete(request.GET.get("q", ""), max(limit, 1))
+    return JsonResponse({
+        "suggestions": [
+            {"id": id, "name": name, "url": reverse("movies.show", args=[id])}
+            for id, name in completions
+        ]
+    })
+
+
+def browse(request):
+    """Catalog filtered by facets, with the result count of every facet value"""
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+    selected = {facet: set(request.GET.getlist(facet)) for facet in facets.FACETS}
+    movie_ids, total, facet_list = facets.browse(selected, page)
+    movies = snapshot.records(movie_ids)
+
+    # Current filters without the page number, for the pager links
+    query = request.GET.copy()
+    query.pop("page", None)
+
+    template_data = {}
+    template_data["title"] = "Browse Movies"
+    template_data["movie_cards"] = movie_cards((movies[id] for id in movie_ids if id in movies), request.user)
+    template_data["facets"] = facet_list
+    template_data["total"] = total
+    template_data["query"] = query.urlencode()
+    template_data["previous_page"] = page - 1 if page > 1 else None
+    template_data["next_page"] = page + 1 if page * facets.PAGE_SIZE < total else None
+    return render(request, "movies/browse.html", {"template_data": template_data})
+
+
+def top_rated(request):
+    """Rated movies ranked by Bayesian average, overall or within one genre"""
+    genre = request.GET.get("genre", "")
+    after = request.GET.get("after")
+    movies, next_token = ratings.top_rated_page(genre or None, after)
+
+    template_data = {}
+    template_data["title"] = "Top Rated"
     template_data["movies"] = movies
-    return render(request, "movies/index.html", {"template_data": template_data})
+    template_data["genre"] = genre
+    template_data["genres"] = sorted(facets.current_index().bitsets["genre"], key=str.lower)
+    template_data["after"] = after
+    template_data["next_token"] = next_token
+    return render(request, "movies/top_rated.html", {"template_data": template_data})
 
 
 def show(request, id):
+    anonymous = not request.user.is_authenticated
+    if anonymous and not request.GET and publishing.enabled():
+        response = published_response(request, id)
+        if response:
+            return response
+
     movie = Movie.objects.get(id=id)
-    reviews = Review.objects.filter(movie=movie, is_reported=False)
     
     # Track movie view for popularity
     track_movie_view(movie, request.user)
-    
+
+    template_data = movie_page_data(movie, request.user, request.GET.get("reviews_after"))
+    return render(request, "movies/show.html", {"template_data": template_data})
+
+
+def movie_page_data(movie, user=None, reviews_after=None):
+    """template_data of a movie detail page; user None renders the anonymous view"""
+    user = user or AnonymousUser()
+    movie_reviews, next_reviews = reviews.feed_page(movie.id, reviews_after)
+
+    # Embedded in the page so the rating widget needs no follow-up requests
+    rating_state = ratings.summarize(movie)
+    rating_state["user_rating"] = ratings.user_ratings(user, [movie.id]).get(movie.id, 0)
+
     template_data = {}
     template_data["title"] = movie.name
     template_data["movie"] = movie
-    template_data["reviews"] = reviews
-    return render(request, "movies/show.html", {"template_data": template_data})
+    template_data["reviews"] = movie_reviews
+    template_data["next_reviews"] = next_reviews
+    template_data["rating_state"] = rating_state
+    template_data["also_bought"] = also_bought([movie.id])
+    return template_data
 
 
 @login_required
@@ -81,11 +242,54 @@ def delete_review(request, id, review_id):
 @login_required
 def report_review(request, id, review_id):
     review = get_object_or_404(Review, id=review_id)
-    review.is_reported = True
-    review.save()
+    reviews.report(review, request.user)
     return redirect("movies.show", id=id)
 
 
+@staff_member_required
+def moderation(request):
+    """Queue of reported reviews with bulk hide, restore and delete"""
+    if request.method == "POST":
+        action = request.POST.get("action")
+        if action in reviews.MODERATION_ACTIONS:
+            if request.POST.get("scope") == "all":
+                review_ids = None
+            else:
+                review_ids = [int(id) for id in request.POST.getlist("review_ids") if id.isdigit()]
+            count = reviews.moderate(action, review_ids)
+            messages.success(request, f"{action.capitalize()}: {count} review{'s' if count != 1 else ''}.")
+        return redirect("movies.moderation")
+
+    after = request.GET.get("after")
+    queued, next_token = reviews.moderation_page(after)
+    template_data = {
+        "title": "Review moderation",
+        "reviews": queued,
+        "total": reviews.moderation_queue().count(),
+        "after": after,
+        "next_token": next_token,
+    }
+    return render(request, "movies/moderation.html", {"template_data": template_data})
+
+
+def review_feed(request, id):
+    """JSON page of a movie's visible reviews, newest first"""
+    get_object_or_404(Movie, id=id)
+    movie_reviews, next_token = reviews.feed_page(id, request.GET.get("after"))
+    return JsonResponse({
+        "reviews": [
+            {
+                "id": review.id,
+                "user": review.user.username,
+                "comment": review.comment,
+                "date": review.date.isoformat(),
+            }
+            for review in movie_reviews
+        ],
+        "next": next_token,
+    })
+
+
 @login_required
 @require_POST
 @csrf_exempt
@@ -99,21 +303,13 @@ def submit_rating(request, id):
         if rating_value < 1 or rating_value > 5:
             return JsonResponse({'error': 'Rating must be between 1 and 5'}, status=400)
         
-        # Get or create rating (update if exists due to unique_together constraint)
-        rating, created = Rating.objects.get_or_create(
-            user=request.user,
-            movie=movie,
-            defaults={'rating': rating_value}
-        )
-        
-        if not created:
-            # Update existing rating
-            rating.rating = rating_value
-            rating.save()
+        ratings.rate_movie(request.user, movie.id, rating_value)
+        row = Movie.objects.filter(id=movie.id).values(*ratings.AGGREGATE_FIELDS).first()
         
         return JsonResponse({
             'success': True,
             'rating': rating_value,
+            'summary': ratings.summarize(row),
             'message': 'Rating submitted successfully'
         })
         
@@ -123,36 +319,70 @@ def submit_rating(request, id):
         return JsonResponse({'error': 'An error occurred'}, status=500)
 
 
+@login_required
+@require_POST
+@csrf_exempt
+def submit_ratings(request):
+    """Rate many movies at once, e.g. from onboarding.
+
+    Expects {"ratings": [{"movie_id": 1, "rating": 5}, ...]}; the batch is
+    validated as a whole and written in one transaction.
+    """
+    try:
+        data = json.loads(request.body)
+        entries = data["ratings"]
+        if not isinstance(entries, list) or not 0 < len(entries) <= MAX_BULK_RATINGS:
+            return JsonResponse(
+                {'error': f'Send between 1 and {MAX_BULK_RATINGS} ratings'}, status=400
+            )
+        # A movie listed twice keeps its last rating
+        stars_by_movie = {
+            _json_int(entry["movie_id"]): _json_int(entry["rating"]) for entry in entries
+        }
+    except (ValueError, TypeError, KeyError, json.JSONDecodeError):
+        return JsonResponse({'error': 'Invalid rating data'}, status=400)
+
+    if any(stars < 1 or stars > 5 for stars in stars_by_movie.values()):
+        return JsonResponse({'error': 'Rating must be between 1 and 5'}, status=400)
+    known = set(Movie.objects.filter(id__in=stars_by_movie).values_list("id", flat=True))
+    unknown = sorted(set(stars_by_movie) - known)
+    if unknown:
+        return JsonResponse({'error': 'Unknown movies', 'movie_ids': unknown}, status=400)
+
+    updated = ratings.apply_ratings(request.user, stars_by_movie)
+    return JsonResponse({
+        'success': True,
+        'updated': updated,
+        'ratings': ratings.rating_states(list(stars_by_movie), request.user),
+    })
+
+
+def _json_int(value):
+    # int() would quietly turn 4.9 into 4 and true into 1
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise TypeError(f"Expected an integer, got {value!r}")
+    return value
+
+
 def rating_summary(request, id):
+    # Single-row read of the aggregates maintained by movies.ratings
+    row = Movie.objects.filter(id=id).values(*ratings.AGGREGATE_FIELDS).first()
+    if row is None:
+        raise Http404("No Movie matches the given query.")
+    return JsonResponse(ratings.summarize(row))
+
+
+def rating_states(request):
+    """Rating summaries and the caller's own ratings for ?ids=1,2,3"""
     try:
-        movie = get_object_or_404(Movie, id=id)
-        ratings = movie.user_ratings.all()
-        
-        if not ratings.exists():
-            return JsonResponse({
-                'average_rating': 0,
-                'total_ratings': 0,
-                'rating_distribution': {str(i): 0 for i in range(1, 6)}
-            })
-        
-        # Calculate average rating
-        total_ratings = ratings.count()
-        average_rating = sum(r.rating for r in ratings) / total_ratings
-        
-        # Calculate rating distribution
-        rating_distribution = {}
-        for i in range(1, 6):
-            count = ratings.filter(rating=i).count()
-            rating_distribution[str(i)] = count
-        
-        return JsonResponse({
-            'average_rating': round(average_rating, 2),
-            'total_ratings': total_ratings,
-            'rating_distribution': rating_distribution
-        })
-        
-    except Exception as e:
-        return JsonResponse({'error': 'An error occurred'}, status=500)
+        movie_ids = [int(id) for id in request.GET.get('ids', '').split(',') if id]
+    except ValueError:
+        return JsonResponse({'error': 'ids must be a comma-separated list of movie ids'}, status=400)
+    if len(movie_ids) > MAX_RATING_STATES:
+        return JsonResponse({'error': f'At most {MAX_RATING_STATES} ids per request'}, status=400)
+
+    states = ratings.rating_states(movie_ids, request.user)
+    return JsonResponse({'movies': {str(id): state for id, state in states.items()}})
 
 
 @login_required
@@ -160,11 +390,11 @@ def user_rating(request, id):
     """Get the current user's rating for a movie"""
     try:
         movie = get_object_or_404(Movie, id=id)
-        rating = Rating.objects.filter(user=request.user, movie=movie).first()
+        stars = rating_maps.rating_map(request.user).get(movie.id)
         
-        if rating:
+        if stars:
             return JsonResponse({
-                'user_rating': rating.rating,
+                'user_rating': stars,
                 'has_rated': True
             })
         else:
@@ -183,27 +413,19 @@ def track_movie_view(movie, user):
         return
         
     # Get user's state from their profile
-    try:
-        from accounts.models import UserProfile
-        profile = UserProfile.objects.get(user=user)
-        user_state = profile.state
-    except:
+    from accounts.models import UserProfile
+    profile_state = UserProfile.objects.filter(user=user).values_list('state_id', flat=True)
+    if profile_state:
+        user_state_id = profile_state[0]
+    else:
         # Fallback to Georgia if no profile exists
-        try:
-            user_state = State.objects.get(name='Georgia')
-        except State.DoesNotExist:
-            user_state = State.objects.first()
+        user_state_id = (
+            State.objects.filter(name='Georgia').values_list('id', flat=True).first()
+            or State.objects.values_list('id', flat=True).first()
+        )
     
-    if not user_state:
+    if not user_state_id:
         return
     
-    # Get or create MoviePopularity record for this movie and state
-    movie_popularity, created = MoviePopularity.objects.get_or_create(
-        movie=movie,
-        state=user_state,
-        defaults={'purchase_count': 0, 'view_count': 0}
-    )
-    
-    # Update view count
-    movie_popularity.view_count += 1
-    movie_popularity.save()
+    # Buffered in memory and flushed as batched upserts (see regions.counters)
+    view_counter.add(movie.id, user_state_id, viewer=user.id)
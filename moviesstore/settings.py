@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     'cart',
     'petitions',
     'regions',
+    'recommendations',
 ]
 
 MIDDLEWARE = [
@@ -134,4 +135,50 @@ STATICFILES_DIRS = [
 ]
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-MEDIA_URL = '/media/'
\ No newline at end of file
+MEDIA_URL = '/media/'
+
+# Version counters, cached page fragments and per-user rating maps (see
+# movies.catalog, movies.fragments and movies.rating_maps). The local-memory
+# backend below is private to one process and only suits a single-process
+# server such as runserver. Running several worker processes REQUIRES a
+# shared backend such as Redis or Memcached: otherwise an invalidation only
+# reaches the process that made the write, and the others keep serving stale
+# cards and ratings. The local-memory default of 300 entries is too small to
+# hold the card fragments of one 1k-movie page.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+
+# Movie page views are buffered in memory and written as batched upserts.
+# Set the interval to 0 to write every view synchronously.
+VIEW_COUNTER_FLUSH_INTERVAL = 5.0
+VIEW_COUNTER_MAX_KEYS = 10000
+
+# Offline model files (co-purchase counts, rating factors)
+RECOMMENDATIONS_DIR = os.path.join(BASE_DIR, 'var', 'recommendations')
+
+# Memory-mapped catalog snapshot shared by all worker processes
+CATALOG_SNAPSHOT_PATH = os.path.join(BASE_DIR, 'var', 'catalog.snapshot')
+
+# Serve pre-rendered movie pages to anonymous visitors (run publish_pages first)
+PUBLISH_PAGES = False
+PUBLISHED_PAGES_DIR = os.path.join(BASE_DIR, 'var', 'pages')
+
+# Persisted trigram indexes for fuzzy title matching
+TRIGRAM_INDEX_DIR = os.path.join(BASE_DIR, 'var', 'trigrams')
+
+# Prior of the Bayesian average behind the top rated ranking: every movie
+# starts with RATING_PRIOR_WEIGHT virtual ratings of RATING_PRIOR_MEAN stars.
+# Run reconcile_movie_aggregates after changing them.
+RATING_PRIOR_MEAN = 3.0
+RATING_PRIOR_WEIGHT = 10
+
+# Anonymous carts live in a signed cookie instead of the session, so adding
+# to the cart writes nothing to the database (see cart.storage). Carts whose
+# cookie would exceed CART_COOKIE_MAX_BYTES fall back to the session.
+CART_ANONYMOUS_STORAGE = 'cart.storage.CookieCartStorage'
+CART_COOKIE_NAME = 'cart'
+CART_COOKIE_MAX_BYTES = 2048
@@ -0,0 +1,41 @@
+// Title completions for inputs marked with data-typeahead-url.
+// Suggestions are offered through a <datalist>, so the browser renders them.
+document.addEventListener('DOMContentLoaded', function() {
+  document.querySelectorAll('input[data-typeahead-url]').forEach(function(input, position) {
+    const list = document.createElement('datalist');
+    list.id = `typeahead-${position}`;
+    input.after(list);
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+
+    let timer = null;
+    let latest = 0;
+    input.addEventListener('input', function() {
+      clearTimeout(timer);
+      const query = input.value.trim();
+      if (!query) {
+        list.replaceChildren();
+        return;
+      }
+      timer = setTimeout(function() {
+        const request = ++latest;
+        fetch(`${input.dataset.typeaheadUrl}?q=${encodeURIComponent(query)}`)
+        .then(response => response.json())
+        .then(data => {
+          // Drop answers to queries the user has already typed past
+          if (request !== latest) {
+            return;
+          }
+          list.replaceChildren(...data.suggestions.map(function(suggestion) {
+            const option = document.createElement('option');
+            option.value = suggestion.name;
+            return option;
+          }));
+        })
+        .catch(error => {
+          console.error('Error loading suggestions:', error);
+        });
+      }, 100);
+    });
+  });
+});
@@ -1,8 +1,11 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils import timezone
 from datetime import timedelta
 from .models import Petition, Vote
 from movies.models import Movie
+from movies.trigrams import movie_titles, similarity
+from .cards import invalidate_cards
+from .duplicates import BLOCKING_THRESHOLD, DUPLICATE_THRESHOLD, petitions_changed, same_movie
 
 
 class VoteInline(admin.TabularInline):
@@ -32,7 +35,7 @@ class PetitionAdmin(admin.ModelAdmin):
         }),
     )
     
-    actions = ['approve_petitions', 'reject_petitions']
+    actions = ['approve_petitions', 'approve_petitions_anyway', 'reject_petitions']
     
     def is_expired_display(self, obj):
         """Display if petition is expired"""
@@ -41,9 +44,32 @@ class PetitionAdmin(admin.ModelAdmin):
     is_expired_display.short_description = 'Expired'
     
     def approve_petitions(self, request, queryset):
-        """Approve selected petitions and create movies"""
+        """Approve selected petitions and create movies, skipping ones we already carry"""
+        self._approve(request, queryset, check_duplicates=True)
+    approve_petitions.short_description = 'Approve selected petitions and create movies'
+
+    def approve_petitions_anyway(self, request, queryset):
+        """Approve selected petitions even if they look like movies we already carry"""
+        self._approve(request, queryset, check_duplicates=False)
+    approve_petitions_anyway.short_description = 'Approve selected petitions even if they look like existing movies'
+
+    def _approve(self, request, queryset, check_duplicates):
         approved_count = 0
+        created = []
+        skipped = []
+        similar = []
         for petition in queryset.filter(status='pending'):
+            matches = movie_titles.search(petition.movie_title, 3, DUPLICATE_THRESHOLD)
+            if check_duplicates:
+                # Includes movies created earlier in this same batch
+                duplicate = self._duplicate_of(petition, matches, created)
+                if duplicate:
+                    skipped.append(f'"{petition.movie_title}" (matches "{duplicate}")')
+                    continue
+            if matches:
+                titles = ', '.join(f'"{title}"' for _, title, _ in matches)
+                similar.append(f'"{petition.movie_title}" (similar to {titles})')
+
             # Create movie from petition
             movie = Movie(
                 name=petition.movie_title,
@@ -56,6 +82,7 @@ class PetitionAdmin(admin.ModelAdmin):
                 rating='PG'  # Default rating
             )
             movie.save()
+            created.append((petition.movie_title, petition.movie_year))
             
             # Update petition status
             petition.status = 'approved'
@@ -63,11 +90,45 @@ class PetitionAdmin(admin.ModelAdmin):
             approved_count += 1
         
         self.message_user(request, f'{approved_count} petitions approved and movies created.')
-    approve_petitions.short_description = 'Approve selected petitions and create movies'
+        if skipped:
+            self.message_user(
+                request,
+                f'Skipped {len(skipped)} petitions that look like existing movies '
+                f'(use "{self.approve_petitions_anyway.short_description}" to create them): '
+                + ', '.join(skipped),
+                level=messages.WARNING,
+            )
+        if similar:
+            self.message_user(
+                request,
+                'Approved petitions with similar titles in the catalog, check they are not duplicates: '
+                + ', '.join(similar),
+                level=messages.WARNING,
+            )
+
+    def _duplicate_of(self, petition, matches, created):
+        """Title of the movie a petition duplicates, or None for new films, sequels and remakes"""
+        years = dict(Movie.objects.filter(
+            id__in=[movie_id for movie_id, _, _ in matches]
+        ).values_list('id', 'release_year'))
+        candidates = [
+            (title, years.get(movie_id)) for movie_id, title, score in matches if score >= BLOCKING_THRESHOLD
+        ] + [
+            (title, year) for title, year in created
+            if similarity(petition.movie_title, title) >= BLOCKING_THRESHOLD
+        ]
+        for title, year in candidates:
+            if same_movie(petition.movie_title, title, petition.movie_year, year):
+                return title
+        return None
     
     def reject_petitions(self, request, queryset):
         """Reject selected petitions"""
-        updated = queryset.filter(status='pending').update(status='rejected')
+        pending = queryset.filter(status='pending')
+        petition_ids = list(pending.values_list('id', flat=True))
+        updated = pending.update(status='rejected')
+        invalidate_cards(petition_ids)
+        petitions_changed()
         self.message_user(request, f'{updated} petitions rejected.')
     reject_petitions.short_description = 'Reject selected petitions'
 
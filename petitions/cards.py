@@ -0,0 +1,17 @@
+"""Cached petition cards for the petition list, see movies.fragments"""
+from movies import fragments
+
+PETITION_CARD = 'petitions/fragments/petition_card.html'
+
+
+def card_key(petition):
+    # The card shows an "Expired" badge once the petition is a week old
+    return f'{petition.id}:{int(petition.is_expired)}'
+
+
+def petition_cards(petitions):
+    return fragments.render_fragments(PETITION_CARD, petitions, 'petition', key=card_key)
+
+
+def invalidate_cards(petition_ids):
+    fragments.invalidate(PETITION_CARD, [f'{id}:{expired}' for id in petition_ids for expired in (0, 1)])
@@ -0,0 +1,63 @@
+"""Near-duplicate detection for petition titles.
+
+Pending petitions and catalog movies are matched by trigram similarity
+(movies.trigrams). The petition index is versioned by its own counter,
+bumped by the Petition signals and by bulk status changes.
+
+Similarity alone cannot tell a sequel or remake from a duplicate ("Toy
+Story 2" scores 0.83 against "Toy Story"), so DUPLICATE_THRESHOLD only
+drives the hint shown on the petition form. Approval is blocked by a
+match only when it reaches BLOCKING_THRESHOLD and carries the same sequel
+numbers and years (see same_movie).
+"""
+from django.db import transaction
+from movies.catalog import bump_data_version, data_version
+from movies.trigrams import TrigramIndex, movie_titles
+from movies.typeahead import normalize
+
+VERSION_KEY = "petitions:version"
+# "Dark Knight" vs "The Dark Knight" scores 0.75
+DUPLICATE_THRESHOLD = 0.5
+BLOCKING_THRESHOLD = 0.85
+ROMAN_NUMERALS = {'ii', 'iii', 'iv', 'v', 'vi', 'vii', 'viii', 'ix', 'x'}
+
+
+def petitions_version():
+    return data_version(VERSION_KEY)
+
+
+def petitions_changed():
+    transaction.on_commit(lambda: bump_data_version(VERSION_KEY))
+
+
+def _pending_titles():
+    from .models import Petition
+
+    return Petition.objects.filter(status='pending').values_list('id', 'movie_title').iterator()
+
+
+petition_titles = TrigramIndex('petitions', _pending_titles, version=petitions_version)
+
+
+def find_duplicates(title, exclude_petition=None, limit=3):
+    """Catalog movies and pending petitions whose title looks like `title`"""
+    exclude = {exclude_petition} if exclude_petition else ()
+    return {
+        'movies': movie_titles.search(title, limit, DUPLICATE_THRESHOLD),
+        'petitions': petition_titles.search(title, limit, DUPLICATE_THRESHOLD, exclude=exclude),
+    }
+
+
+def sequel_marks(title):
+    """Numbers, years and roman numerals in a title, e.g. {'2'} for Shrek 2"""
+    return {
+        word for word in normalize(title).split()
+        if word.isdigit() or word in ROMAN_NUMERALS
+    }
+
+
+def same_movie(title, other, year=None, other_year=None):
+    """Whether two near-identical titles name the same film rather than a sequel or remake"""
+    if sequel_marks(title) != sequel_marks(other):
+        return False
+    return not (year and other_year and year != other_year)
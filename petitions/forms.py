@@ -1,8 +1,16 @@
 from django import forms
+from django.urls import reverse_lazy
+from .duplicates import find_duplicates
 from .models import Petition
 
 
 class PetitionForm(forms.ModelForm):
+    confirm_duplicate = forms.BooleanField(
+        required=False,
+        label='This is not a duplicate, create it anyway',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+
     class Meta:
         model = Petition
         fields = ['title', 'description', 'movie_title', 'movie_year', 'movie_director', 'movie_genre']
@@ -18,7 +26,8 @@ class PetitionForm(forms.ModelForm):
             }),
             'movie_title': forms.TextInput(attrs={
                 'class': 'form-control',
-                'placeholder': 'Movie title'
+                'placeholder': 'Movie title',
+                'data-typeahead-url': reverse_lazy('movies.suggest'),
             }),
             'movie_year': forms.NumberInput(attrs={
                 'class': 'form-control',
@@ -42,3 +51,17 @@ class PetitionForm(forms.ModelForm):
         self.fields['movie_year'].required = False
         self.fields['movie_director'].required = False
         self.fields['movie_genre'].required = False
+        self.duplicates = None
+
+    def clean(self):
+        cleaned_data = super().clean()
+        title = cleaned_data.get('movie_title')
+        if title and not cleaned_data.get('confirm_duplicate'):
+            duplicates = find_duplicates(title, exclude_petition=self.instance.pk)
+            if duplicates['movies'] or duplicates['petitions']:
+                self.duplicates = duplicates
+                raise forms.ValidationError(
+                    'This movie looks like one we already have or one that is already petitioned. '
+                    'Please check the matches below.'
+                )
+        return cleaned_data
@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .cards import invalidate_cards
+from .duplicates import petitions_changed
+from .models import Petition
+
+
+@receiver(post_save, sender=Petition)
+def petition_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the cached card and the duplicate-title index in step with the petitions"""
+    if raw:
+        return
+    petition_id = instance.id
+    transaction.on_commit(lambda: invalidate_cards([petition_id]))
+    # Vote count refreshes don't touch titles or status
+    if update_fields == frozenset(['votes_count']):
+        return
+    petitions_changed()
+
+
+@receiver(post_delete, sender=Petition)
+def petition_deleted(sender, instance, **kwargs):
+    petition_id = instance.id
+    transaction.on_commit(lambda: invalidate_cards([petition_id]))
+    petitions_changed()
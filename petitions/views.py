@@ -5,6 +5,7 @@ from django.http import JsonResponse
 from django.db import IntegrityError, models
 from django.core.paginator import Paginator
 from .models import Petition, Vote
+from .cards import petition_cards
 from .forms import PetitionForm
 from movies.models import Movie
 from django.utils import timezone
@@ -15,7 +16,7 @@ def index(request):
     search_term = request.GET.get("search", "")
     status_filter = request.GET.get("status", "")
     
-    petitions = Petition.objects.all()
+    petitions = Petition.objects.select_related('created_by')
     
     # Apply search filter
     if search_term:
@@ -37,6 +38,7 @@ def index(request):
     template_data = {
         "title": "Movie Petitions",
         "page_obj": page_obj,
+        "petition_cards": petition_cards(page_obj),
         "search_term": search_term,
         "status_filter": status_filter,
         "status_choices": Petition.STATUS_CHOICES,
@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import MovieNeighbor
+
+
+@admin.register(MovieNeighbor)
+class MovieNeighborAdmin(admin.ModelAdmin):
+    list_display = ['movie', 'rank', 'neighbor', 'score']
+    raw_id_fields = ['movie', 'neighbor']
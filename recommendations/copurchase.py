@@ -0,0 +1,260 @@
+"""Item-to-item "customers also bought" recommendations.
+
+Baskets are the cart Items of each Order. Every unordered pair of distinct
+movies bought in the same order is encoded as one int64 key
+(low_id << KEY_SHIFT | high_id), and pair and per-movie basket counts are
+accumulated with vectorized NumPy sorts, so memory stays proportional to
+the number of distinct pairs rather than movies squared. Pairs are scored
+with cosine similarity, count(a, b) / sqrt(count(a) * count(b)), and the
+TOP_K best neighbours of each movie are stored in MovieNeighbor.
+
+The counts are saved to RECOMMENDATIONS_DIR together with the last
+processed order id, so later runs only read new orders and only rewrite
+the neighbour lists whose scores could have changed.
+"""
+import os
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from movies import snapshot
+from movies.models import Movie
+from .models import MovieNeighbor
+
+KEY_SHIFT = 31
+KEY_MASK = (1 << KEY_SHIFT) - 1
+SCORE_BITS = 40
+TOP_K = 20
+# Orders with more distinct movies than this are bulk buys, not taste signals
+MAX_BASKET_SIZE = 50
+CHUNK_SIZE = 1_000_000
+STATE_FILE = "copurchase_state.npz"
+WRITE_BATCH_SIZE = 5000
+ALSO_BOUGHT_LIMIT = 6
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+def basket_counts(order_ids, movie_ids, max_basket_size=MAX_BASKET_SIZE):
+    """Count co-purchased pairs and per-movie baskets for (order, movie) rows.
+
+    Returns (pair_keys, pair_counts, item_ids, item_counts), each sorted by
+    key or id. Rows may be unsorted and contain duplicates.
+    """
+    orders = np.asarray(order_ids, dtype=np.int64)
+    movies = np.asarray(movie_ids, dtype=np.int64)
+    if not len(orders):
+        return _EMPTY, _EMPTY, _EMPTY, _EMPTY
+
+    sort = np.lexsort((movies, orders))
+    orders, movies = orders[sort], movies[sort]
+    distinct = np.ones(len(orders), dtype=bool)
+    distinct[1:] = (orders[1:] != orders[:-1]) | (movies[1:] != movies[:-1])
+    orders, movies = orders[distinct], movies[distinct]
+
+    item_ids, item_counts = np.unique(movies, return_counts=True)
+
+    starts = np.flatnonzero(np.r_[True, orders[1:] != orders[:-1]])
+    sizes = np.diff(np.r_[starts, len(orders)])
+    usable = (sizes >= 2) & (sizes <= max_basket_size)
+    movies = movies[np.repeat(usable, sizes)]
+    sizes = sizes[usable]
+    if not len(sizes):
+        return _EMPTY, _EMPTY, item_ids, item_counts.astype(np.int64)
+
+    # Pair each row with every later row of its basket. Movies are sorted
+    # within a basket, so the left movie always has the lower id.
+    ends = np.repeat(np.cumsum(sizes), sizes)
+    positions = np.arange(len(movies))
+    partners = ends - positions - 1
+    left = np.repeat(positions, partners)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(partners) - partners, partners)
+    right = left + 1 + offsets
+
+    keys = (movies[left] << KEY_SHIFT) | movies[right]
+    pair_keys, pair_counts = np.unique(keys, return_counts=True)
+    return pair_keys, pair_counts.astype(np.int64), item_ids, item_counts.astype(np.int64)
+
+
+def merge_counts(keys_a, counts_a, keys_b, counts_b):
+    """Sum two sparse (sorted key, count) vectors"""
+    if not len(keys_a):
+        return keys_b, counts_b
+    if not len(keys_b):
+        return keys_a, counts_a
+    keys = np.concatenate([keys_a, keys_b])
+    counts = np.concatenate([counts_a, counts_b])
+    order = np.argsort(keys, kind="stable")
+    keys, counts = keys[order], counts[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.add.reduceat(counts, starts)
+
+
+def cosine_scores(pair_keys, pair_counts, item_ids, item_counts, min_support=1):
+    """Return (low_ids, high_ids, scores) for pairs bought together often enough"""
+    keep = pair_counts >= min_support
+    keys, counts = pair_keys[keep], pair_counts[keep]
+    low, high = keys >> KEY_SHIFT, keys & KEY_MASK
+    low_baskets = item_counts[np.searchsorted(item_ids, low)]
+    high_baskets = item_counts[np.searchsorted(item_ids, high)]
+    return low, high, counts / np.sqrt(low_baskets * high_baskets)
+
+
+def top_neighbors(low, high, scores, top_k=TOP_K, sources=None):
+    """Best top_k neighbours per movie as (movie, neighbor, rank, score) arrays.
+
+    Pairs are symmetric, so each one contributes to both movies' lists. If
+    `sources` is given only those movies' lists are computed.
+    """
+    movie = np.concatenate([low, high])
+    neighbor = np.concatenate([high, low])
+    score = np.concatenate([scores, scores])
+    if sources is not None:
+        wanted = np.isin(movie, sources)
+        movie, neighbor, score = movie[wanted], neighbor[wanted], score[wanted]
+    if not len(movie):
+        return _EMPTY, _EMPTY, _EMPTY, np.zeros(0)
+
+    if movie.max() < 1 << (63 - SCORE_BITS):
+        # Cosine scores are in [0, 1]; pack (movie, descending score) into
+        # one int64 so a single sort orders every list. The sort is stable so
+        # ties rank the same in full and incremental builds.
+        rank_key = ((1.0 - score) * ((1 << SCORE_BITS) - 1)).astype(np.int64)
+        order = np.argsort((movie << SCORE_BITS) | rank_key, kind="stable")
+    else:
+        order = np.lexsort((-score, movie))
+    movie, neighbor, score = movie[order], neighbor[order], score[order]
+    starts = np.flatnonzero(np.r_[True, movie[1:] != movie[:-1]])
+    rank = np.arange(len(movie)) - np.repeat(starts, np.diff(np.r_[starts, len(movie)]))
+    keep = rank < top_k
+    return movie[keep], neighbor[keep], rank[keep], score[keep]
+
+
+def state_path():
+    return os.path.join(settings.RECOMMENDATIONS_DIR, STATE_FILE)
+
+
+def load_state():
+    try:
+        with np.load(state_path()) as data:
+            return {name: data[name] for name in data.files}
+    except OSError:
+        return None
+
+
+def save_state(state):
+    path = state_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **state)
+    os.replace(tmp_path, path)
+
+
+def item_chunks(after_order_id=0, chunk_size=CHUNK_SIZE):
+    """Yield (order_ids, movie_ids) arrays of whole orders newer than after_order_id"""
+    from cart.models import Item
+
+    cursor = after_order_id
+    while True:
+        rows = list(
+            Item.objects.filter(order_id__gt=cursor)
+            .order_by("order_id")
+            .values_list("order_id", "movie_id")[:chunk_size]
+        )
+        if not rows:
+            return
+        orders, movies = np.array(rows, dtype=np.int64).T
+        if len(rows) == chunk_size and orders[0] != orders[-1]:
+            # The last order may continue past this chunk; re-read it next time
+            complete = orders != orders[-1]
+            orders, movies = orders[complete], movies[complete]
+        yield orders, movies
+        cursor = int(orders[-1])
+
+
+def build(full=False, top_k=TOP_K, min_support=1, max_basket_size=MAX_BASKET_SIZE,
+          chunk_size=CHUNK_SIZE):
+    """Fold new orders into the saved counts and refresh affected neighbour lists"""
+    state = None if full else load_state()
+    if state is None:
+        full = True
+        state = {
+            "pair_keys": _EMPTY, "pair_counts": _EMPTY,
+            "item_ids": _EMPTY, "item_counts": _EMPTY,
+            "last_order_id": np.array(0),
+        }
+
+    changed = _EMPTY
+    new_orders = 0
+    for orders, movies in item_chunks(int(state["last_order_id"]), chunk_size):
+        pair_keys, pair_counts, item_ids, item_counts = basket_counts(orders, movies, max_basket_size)
+        state["pair_keys"], state["pair_counts"] = merge_counts(
+            state["pair_keys"], state["pair_counts"], pair_keys, pair_counts)
+        state["item_ids"], state["item_counts"] = merge_counts(
+            state["item_ids"], state["item_counts"], item_ids, item_counts)
+        changed = np.union1d(changed, item_ids)
+        new_orders += len(np.unique(orders))
+        state["last_order_id"] = np.array(orders[-1])
+
+    low, high, scores = cosine_scores(
+        state["pair_keys"], state["pair_counts"],
+        state["item_ids"], state["item_counts"], min_support,
+    )
+    if full:
+        sources = None
+    else:
+        # A movie's basket count feeds the score of every pair it is in, so
+        # the partners of changed movies need fresh lists too
+        touched = np.isin(low, changed) | np.isin(high, changed)
+        sources = np.union1d(changed, np.concatenate([low[touched], high[touched]]))
+
+    movie, neighbor, rank, score = top_neighbors(low, high, scores, top_k, sources)
+    written = write_neighbors(movie, neighbor, rank, score, sources)
+    save_state(state)
+    return {
+        "orders": new_orders,
+        "pairs": len(state["pair_keys"]),
+        "movies": len(np.unique(movie)),
+        "rows": written,
+        "full": full,
+        # Movies whose neighbour lists were rewritten; None means all of them
+        "sources": None if full else sources.tolist(),
+    }
+
+
+def write_neighbors(movie, neighbor, rank, score, sources=None):
+    """Replace the stored lists of `sources` (all lists if None)"""
+    existing = np.array(sorted(Movie.objects.values_list("id", flat=True)), dtype=np.int64)
+    live = np.isin(movie, existing) & np.isin(neighbor, existing)
+    rows = [
+        MovieNeighbor(movie_id=m, neighbor_id=n, rank=r, score=s)
+        for m, n, r, s in zip(movie[live].tolist(), neighbor[live].tolist(),
+                              rank[live].tolist(), score[live].tolist())
+    ]
+    with transaction.atomic():
+        if sources is None:
+            MovieNeighbor.objects.all().delete()
+        else:
+            ids = sources.tolist()
+            for start in range(0, len(ids), WRITE_BATCH_SIZE):
+                MovieNeighbor.objects.filter(movie_id__in=ids[start:start + WRITE_BATCH_SIZE]).delete()
+        MovieNeighbor.objects.bulk_create(rows, batch_size=WRITE_BATCH_SIZE)
+    return len(rows)
+
+
+def also_bought(movie_ids, limit=ALSO_BOUGHT_LIMIT):
+    """Movies most often bought with any of movie_ids, best first"""
+    movie_ids = {int(id) for id in movie_ids}
+    if not movie_ids:
+        return []
+    scores = defaultdict(float)
+    rows = MovieNeighbor.objects.filter(
+        movie_id__in=movie_ids, rank__lt=limit + len(movie_ids)
+    ).values_list("neighbor_id", "score")
+    for neighbor_id, score in rows:
+        if neighbor_id not in movie_ids:
+            scores[neighbor_id] += score
+    best = sorted(scores, key=scores.get, reverse=True)[:limit]
+    movies = snapshot.records(best)
+    return [movies[id] for id in best if id in movies]
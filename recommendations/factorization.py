@@ -0,0 +1,298 @@
+"""Personalized recommendations from explicit star ratings.
+
+train() factorizes the user x movie rating matrix with alternating least
+squares: ratings are centred on their global mean, and each half-step
+solves one small ridge regression per user (or movie). The regressions are
+batched into blocks, so the k x k normal equations are built with einsum
+and solved with one np.linalg.solve call per block.
+
+Models are written as .npy arrays to a versioned directory under
+RECOMMENDATIONS_DIR/factors and published by atomically replacing the
+CURRENT pointer file. Serving opens the arrays with mmap_mode="r", so every
+worker process shares the same page-cache copy instead of loading its own.
+
+fold_in() is the incremental path: users with new Rating rows get their
+vectors re-solved against the fixed movie factors, and movies missing from
+the model are solved against the fixed user factors. Changed star values on
+existing ratings are picked up by the next full train().
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+FACTORS = 32
+ITERATIONS = 10
+REGULARIZATION = 0.1
+# Upper bound on the (ratings, k, k) outer-product buffer per solve block
+BLOCK_BYTES = 64 * 1024 * 1024
+KEEP_VERSIONS = 2
+# How often serving processes look for a newly published model
+RELOAD_CHECK_INTERVAL = 5.0
+ARRAYS = ("user_ids", "user_factors", "item_ids", "item_factors")
+
+_loaded = {"version": None, "model": None, "checked": 0.0}
+_load_lock = threading.Lock()
+
+
+def factors_root():
+    return os.path.join(settings.RECOMMENDATIONS_DIR, "factors")
+
+
+def solve_side(rows, cols, values, other, n_rows, reg):
+    """Least-squares factors for every row given the fixed `other` factors.
+
+    rows, cols and values describe the observed ratings and must be sorted
+    by rows. Rows without ratings get zero vectors.
+    """
+    k = other.shape[1]
+    result = np.zeros((n_rows, k), dtype=np.float32)
+    if not len(rows):
+        return result
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    ends = np.r_[starts[1:], len(rows)]
+    max_ratings = max(1, BLOCK_BYTES // (k * k * 4))
+    identity = reg * np.eye(k, dtype=np.float32)
+
+    first = 0
+    while first < len(starts):
+        # Take as many whole rows as fit in the outer-product buffer
+        last = int(np.searchsorted(ends, starts[first] + max_ratings, side="right"))
+        last = max(last, first + 1)
+        lo, hi = starts[first], ends[last - 1]
+        vectors = other[cols[lo:hi]]
+        group_starts = starts[first:last] - lo
+        gram = np.add.reduceat(np.einsum("ni,nj->nij", vectors, vectors), group_starts)
+        rhs = np.add.reduceat(vectors * values[lo:hi, None], group_starts)
+        counts = (ends[first:last] - starts[first:last])[:, None, None]
+        # Scale the penalty with the number of ratings (weighted-lambda ALS)
+        result[rows[starts[first:last]]] = np.linalg.solve(
+            gram + identity * counts, rhs[..., None]
+        )[..., 0]
+        first = last
+    return result
+
+
+def als(user_idx, item_idx, values, n_users, n_items, factors=FACTORS,
+        iterations=ITERATIONS, reg=REGULARIZATION, seed=0):
+    """Alternating least squares on centred ratings; returns (U, V)"""
+    rng = np.random.default_rng(seed)
+    items = (rng.standard_normal((n_items, factors)) * 0.1).astype(np.float32)
+    by_user = np.lexsort((item_idx, user_idx))
+    by_item = np.lexsort((user_idx, item_idx))
+    values = values.astype(np.float32)
+    users = None
+    for _ in range(iterations):
+        users = solve_side(user_idx[by_user], item_idx[by_user], values[by_user], items, n_users, reg)
+        items = solve_side(item_idx[by_item], user_idx[by_item], values[by_item], users, n_items, reg)
+    return users, items
+
+
+def rmse(model, user_idx, item_idx, values):
+    predictions = np.einsum("ij,ij->i", model["user_factors"][user_idx], model["item_factors"][item_idx])
+    return float(np.sqrt(np.mean((predictions + model["mean"] - values) ** 2)))
+
+
+def load_ratings(after_id=0, user_ids=None, movie_ids=None):
+    """(rating ids, user ids, movie ids, stars) as arrays"""
+    from movies.models import Rating
+
+    queryset = Rating.objects.filter(id__gt=after_id).order_by("id")
+    if user_ids is not None:
+        querysets = [queryset.filter(user_id__in=batch) for batch in _batches(user_ids)]
+    elif movie_ids is not None:
+        querysets = [queryset.filter(movie_id__in=batch) for batch in _batches(movie_ids)]
+    else:
+        querysets = [queryset]
+    rows = [
+        row
+        for queryset in querysets
+        for row in queryset.values_list("id", "user_id", "movie_id", "rating").iterator(chunk_size=100_000)
+    ]
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty.astype(np.float32)
+    ids, users, movies, stars = np.array(rows, dtype=np.int64).T
+    return ids, users, movies, stars.astype(np.float32)
+
+
+def _batches(ids, size=10_000):
+    """Split id lists to stay under database bound-parameter limits"""
+    ids = list(ids)
+    return [ids[start:start + size] for start in range(0, len(ids), size)]
+
+
+def train(factors=FACTORS, iterations=ITERATIONS, reg=REGULARIZATION):
+    """Train a model on every rating and publish it"""
+    rating_ids, users, movies, stars = load_ratings()
+    if not len(rating_ids):
+        return None
+    user_ids, user_idx = np.unique(users, return_inverse=True)
+    item_ids, item_idx = np.unique(movies, return_inverse=True)
+    mean = float(stars.mean())
+    user_factors, item_factors = als(
+        user_idx, item_idx, stars - mean, len(user_ids), len(item_ids),
+        factors, iterations, reg,
+    )
+    model = {
+        "user_ids": user_ids, "user_factors": user_factors,
+        "item_ids": item_ids, "item_factors": item_factors,
+        "mean": mean,
+    }
+    meta = {
+        "factors": factors, "reg": reg, "mean": mean,
+        "last_rating_id": int(rating_ids.max()),
+        "ratings": len(rating_ids),
+        "rmse": rmse(model, user_idx, item_idx, stars),
+    }
+    return publish(model, meta)
+
+
+def fold_in():
+    """Update the published model with ratings added since it was trained"""
+    current = load_model(mmap=False)
+    if current is None:
+        return train()
+    meta = current["meta"]
+    new_ids, new_users, new_movies, _ = load_ratings(after_id=meta["last_rating_id"])
+    if not len(new_ids):
+        return None
+
+    reg = meta["reg"]
+    mean = meta["mean"]
+    user_ids, user_factors = current["user_ids"], current["user_factors"]
+    item_ids, item_factors = current["item_ids"], current["item_factors"]
+
+    # Movies the model has never seen: solve them against fixed user factors
+    unseen_items = np.setdiff1d(np.unique(new_movies), item_ids)
+    if len(unseen_items):
+        _, users, movies, stars = load_ratings(movie_ids=unseen_items.tolist())
+        mask = np.isin(users, user_ids)
+        users, movies, stars = users[mask], movies[mask], stars[mask]
+        order = np.lexsort((users, movies))
+        solved = solve_side(
+            np.searchsorted(unseen_items, movies[order]),
+            np.searchsorted(user_ids, users[order]),
+            stars[order] - mean, user_factors, len(unseen_items), reg,
+        )
+        item_ids, item_factors = _merge_rows(item_ids, item_factors, unseen_items, solved)
+
+    # Users with new ratings: re-solve with all of their ratings
+    changed_users = np.unique(new_users)
+    _, users, movies, stars = load_ratings(user_ids=changed_users.tolist())
+    known = np.isin(movies, item_ids)
+    users, movies, stars = users[known], movies[known], stars[known]
+    order = np.lexsort((movies, users))
+    solved = solve_side(
+        np.searchsorted(changed_users, users[order]),
+        np.searchsorted(item_ids, movies[order]),
+        stars[order] - mean, item_factors, len(changed_users), reg,
+    )
+    user_ids, user_factors = _merge_rows(user_ids, user_factors, changed_users, solved)
+
+    meta = dict(meta, last_rating_id=int(new_ids.max()), ratings=meta["ratings"] + len(new_ids))
+    # Training error is only measured by full runs
+    meta.pop("rmse", None)
+    model = {
+        "user_ids": user_ids, "user_factors": user_factors,
+        "item_ids": item_ids, "item_factors": item_factors,
+    }
+    return publish(model, meta)
+
+
+def _merge_rows(ids, vectors, new_ids, new_vectors):
+    """Replace or insert rows keyed by sorted ids"""
+    merged_ids = np.union1d(ids, new_ids)
+    merged = np.zeros((len(merged_ids), vectors.shape[1]), dtype=np.float32)
+    merged[np.searchsorted(merged_ids, ids)] = vectors
+    merged[np.searchsorted(merged_ids, new_ids)] = new_vectors
+    return merged_ids, merged
+
+
+def publish(model, meta):
+    """Write a new model version and point CURRENT at it"""
+    root = factors_root()
+    version = timezone.now().strftime("%Y%m%d%H%M%S%f")
+    directory = os.path.join(root, version)
+    os.makedirs(directory)
+    for name in ARRAYS:
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(model[name]))
+    meta = dict(meta, version=version, users=len(model["user_ids"]), items=len(model["item_ids"]))
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    pointer = os.path.join(root, "CURRENT")
+    with open(f"{pointer}.tmp", "w") as f:
+        f.write(version)
+    os.replace(f"{pointer}.tmp", pointer)
+
+    versions = sorted(name for name in os.listdir(root) if name.isdigit())
+    for old in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return meta
+
+
+def current_version():
+    try:
+        with open(os.path.join(factors_root(), "CURRENT")) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def load_model(mmap=True, version=None):
+    version = version or current_version()
+    if not version:
+        return None
+    directory = os.path.join(factors_root(), version)
+    try:
+        model = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+            for name in ARRAYS
+        }
+        with open(os.path.join(directory, "meta.json")) as f:
+            model["meta"] = json.load(f)
+    except OSError:
+        return None
+    return model
+
+
+def serving_model():
+    """The published model, memory-mapped once per process"""
+    now = time.monotonic()
+    if now - _loaded["checked"] < RELOAD_CHECK_INTERVAL:
+        return _loaded["model"]
+    with _load_lock:
+        _loaded["checked"] = now
+        version = current_version()
+        if version != _loaded["version"]:
+            _loaded["model"] = load_model(version=version) if version else None
+            _loaded["version"] = version
+    return _loaded["model"]
+
+
+def recommend(user_id, n=10, exclude=()):
+    """Top-n movie ids for the user by predicted rating, or None if unknown"""
+    model = serving_model()
+    if model is None:
+        return None
+    user_ids = model["user_ids"]
+    position = int(np.searchsorted(user_ids, user_id))
+    if position >= len(user_ids) or user_ids[position] != user_id:
+        return None
+
+    scores = model["item_factors"] @ model["user_factors"][position]
+    item_ids = model["item_ids"]
+    if exclude:
+        excluded = np.fromiter(exclude, dtype=np.int64)
+        scores = np.where(np.isin(item_ids, excluded), -np.inf, scores)
+
+    n = min(n, len(scores))
+    best = np.argpartition(-scores, n - 1)[:n]
+    best = best[np.argsort(-scores[best])]
+    return [int(item_ids[i]) for i in best if np.isfinite(scores[i])]
@@ -0,0 +1,67 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from recommendations import copurchase
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the co-purchase pipeline on a synthetic catalog (no database access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movies', type=int, default=100_000)
+        parser.add_argument('--items', type=int, default=10_000_000)
+        parser.add_argument('--basket-size', type=float, default=4.0,
+                            help='Mean number of movies per order')
+        parser.add_argument('--chunk-size', type=int, default=copurchase.CHUNK_SIZE)
+        parser.add_argument('--top-k', type=int, default=copurchase.TOP_K)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        n_movies, n_items = options['movies'], options['items']
+
+        started = time.perf_counter()
+        # Long-tailed popularity: a few blockbusters, many rarely bought titles
+        weights = 1.0 / np.arange(1, n_movies + 1) ** 0.8
+        movie_ids = rng.choice(n_movies, size=n_items, p=weights / weights.sum()) + 1
+        sizes = rng.poisson(options['basket_size'] - 1, size=n_items) + 1
+        sizes = sizes[np.cumsum(sizes) <= n_items]
+        order_ids = np.repeat(np.arange(1, len(sizes) + 1), sizes)
+        movie_ids = movie_ids[:len(order_ids)]
+        self.report('generate', started, f'{len(order_ids):,} items in {len(sizes):,} orders')
+
+        started = time.perf_counter()
+        pair_keys, pair_counts = np.zeros(0, np.int64), np.zeros(0, np.int64)
+        item_ids, item_counts = np.zeros(0, np.int64), np.zeros(0, np.int64)
+        chunk = options['chunk_size']
+        for start in range(0, len(order_ids), chunk):
+            stop = start + chunk
+            # Align chunk boundaries to whole orders, as item_chunks() does
+            while stop < len(order_ids) and order_ids[stop] == order_ids[stop - 1]:
+                stop += 1
+            keys, counts, ids, totals = copurchase.basket_counts(order_ids[start:stop], movie_ids[start:stop])
+            pair_keys, pair_counts = copurchase.merge_counts(pair_keys, pair_counts, keys, counts)
+            item_ids, item_counts = copurchase.merge_counts(item_ids, item_counts, ids, totals)
+        self.report('count pairs', started, f'{len(pair_keys):,} distinct pairs')
+
+        started = time.perf_counter()
+        low, high, scores = copurchase.cosine_scores(pair_keys, pair_counts, item_ids, item_counts)
+        self.report('score', started)
+
+        started = time.perf_counter()
+        movie, neighbor, rank, score = copurchase.top_neighbors(low, high, scores, options['top_k'])
+        self.report('top-k', started, f'{len(movie):,} neighbour rows for {len(np.unique(movie)):,} movies')
+
+        started = time.perf_counter()
+        changed = np.unique(movie_ids[-n_items // 100:])
+        touched = np.isin(low, changed) | np.isin(high, changed)
+        sources = np.union1d(changed, np.concatenate([low[touched], high[touched]]))
+        copurchase.top_neighbors(low, high, scores, options['top_k'], sources)
+        self.report('incremental top-k', started, f'{len(sources):,} lists after 1% new items')
+
+        state_bytes = pair_keys.nbytes + pair_counts.nbytes + item_ids.nbytes + item_counts.nbytes
+        self.stdout.write(f'Saved state size: {state_bytes / 1e6:.1f} MB')
+
+    def report(self, step, started, detail=''):
+        self.stdout.write(f'{step:>18}: {time.perf_counter() - started:8.2f}s  {detail}')
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from movies import publishing
+from recommendations import copurchase
+
+
+class Command(BaseCommand):
+    help = 'Build or incrementally update "customers also bought" neighbours from orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Discard saved counts and rebuild from every order')
+        parser.add_argument('--top-k', type=int, default=copurchase.TOP_K)
+        parser.add_argument('--min-support', type=int, default=1,
+                            help='Minimum number of shared orders for a pair to count')
+        parser.add_argument('--max-basket-size', type=int, default=copurchase.MAX_BASKET_SIZE)
+        parser.add_argument('--chunk-size', type=int, default=copurchase.CHUNK_SIZE,
+                            help='Order items read per query')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stats = copurchase.build(
+            full=options['full'],
+            top_k=options['top_k'],
+            min_support=options['min_support'],
+            max_basket_size=options['max_basket_size'],
+            chunk_size=options['chunk_size'],
+        )
+        elapsed = time.perf_counter() - started
+        mode = 'Full build' if stats['full'] else 'Incremental update'
+        self.stdout.write(
+            f"{mode}: {stats['orders']} new orders, {stats['pairs']} co-purchased pairs, "
+            f"{stats['rows']} neighbour rows for {stats['movies']} movies"
+        )
+        self.stdout.write(self.style.SUCCESS(f'Done in {elapsed:.2f}s'))
+
+        if publishing.enabled() and stats['sources'] != []:
+            # Detail pages embed their movie's "also bought" list; re-render
+            # the ones whose list changed (all of them after a full build)
+            ids = [] if stats['sources'] is None else stats['sources']
+            call_command('publish_pages', *map(str, ids), stdout=self.stdout, stderr=self.stderr)
\ No newline at end of file
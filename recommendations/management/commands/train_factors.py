@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recommendations import factorization
+
+
+class Command(BaseCommand):
+    help = 'Train (or incrementally update) the rating matrix factorization model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Fold ratings added since the last run into the published model')
+        parser.add_argument('--factors', type=int, default=factorization.FACTORS)
+        parser.add_argument('--iterations', type=int, default=factorization.ITERATIONS)
+        parser.add_argument('--reg', type=float, default=factorization.REGULARIZATION)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['incremental']:
+            meta = factorization.fold_in()
+        else:
+            meta = factorization.train(options['factors'], options['iterations'], options['reg'])
+        elapsed = time.perf_counter() - started
+
+        if meta is None:
+            self.stdout.write(self.style.WARNING('No new ratings; the published model is unchanged.'))
+            return
+
+        self.stdout.write(
+            f"Published model {meta['version']}: {meta['users']} users x {meta['items']} movies, "
+            f"{meta['ratings']} ratings" + (f", training RMSE {meta['rmse']:.3f}" if 'rmse' in meta else '')
+        )
+        self.stdout.write(self.style.SUCCESS(f'Done in {elapsed:.2f}s'))
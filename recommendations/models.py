@@ -0,0 +1,18 @@
+from django.db import models
+from movies.models import Movie
+
+
+class MovieNeighbor(models.Model):
+    """Top-K "customers also bought" list of a movie, built offline"""
+    id = models.AutoField(primary_key=True)
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    rank = models.SmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ['movie', 'rank']
+        ordering = ['movie', 'rank']
+
+    def __str__(self):
+        return f"{self.movie_id} -> {self.neighbor_id} ({self.score:.3f})"
@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('for-you/', views.for_you, name='recommendations.for_you'),
+]
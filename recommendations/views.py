@@ -0,0 +1,38 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.urls import reverse
+from movies.models import Movie
+from movies import projections, rating_maps
+from movies.images import image_fields
+from . import factorization
+
+MAX_RECOMMENDATIONS = 50
+
+
+@login_required
+def for_you(request):
+    """Top-N movies the user has not rated yet, by predicted rating"""
+    try:
+        n = min(max(int(request.GET.get('n', 10)), 1), MAX_RECOMMENDATIONS)
+    except ValueError:
+        return JsonResponse({'error': 'n must be an integer'}, status=400)
+
+    rated = rating_maps.rating_map(request.user).movie_ids()
+    movie_ids = factorization.recommend(request.user.id, n, exclude=rated)
+    if movie_ids is None:
+        return JsonResponse({'personalized': False, 'movies': []})
+
+    movies = Movie.objects.only(*projections.fields('listing')).in_bulk(movie_ids)
+    return JsonResponse({
+        'personalized': True,
+        'movies': [
+            {
+                'id': movie.id,
+                'name': movie.name,
+                'price': movie.price,
+                **image_fields(movie.image),
+                'url': reverse('movies.show', args=[movie.id]),
+            }
+            for movie in (movies[id] for id in movie_ids if id in movies)
+        ],
+    })
@@ -0,0 +1,247 @@
+"""Batched, atomic increments of the MoviePopularity counters.
+
+increment_popularity() applies many (movie, state) deltas as multi-row
+INSERT ... ON CONFLICT DO UPDATE statements, so concurrent writers never
+lose increments and missing rows are created on the fly.
+
+view_counter buffers page views in memory and writes them behind the
+request: increments for the same (movie, state) are summed and flushed
+every VIEW_COUNTER_FLUSH_INTERVAL seconds, when VIEW_COUNTER_MAX_KEYS
+distinct keys are pending, and at interpreter shutdown.
+
+Views by known users also feed a HyperLogLog sketch per (movie, state,
+day) (see regions.hll), buffered the same way and merged into
+MovieViewerSketch on flush, so repeat views by one user are not counted
+twice by unique_viewers().
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from . import hll
+from .models import MoviePopularity, MovieViewerSketch
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ("purchase_count", "view_count")
+# Rows per INSERT statement, well under SQLite's bound-parameter limit
+UPSERT_BATCH_SIZE = 500
+# Days of viewer sketches merged by unique_viewers()
+UNIQUE_VIEWER_DAYS = 30
+
+
+def increment_popularity(field, deltas):
+    """Add deltas[(movie_id, state_id)] to `field` of each popularity row"""
+    if field not in COUNTER_FIELDS:
+        raise ValueError(f"Unknown popularity counter: {field}")
+    deltas = {key: count for key, count in deltas.items() if count}
+    if not deltas:
+        return
+    with transaction.atomic():
+        if connection.vendor in ("sqlite", "postgresql"):
+            _upsert(field, list(deltas.items()))
+        else:
+            _update_or_create(field, deltas)
+
+
+def _upsert(field, rows):
+    table = connection.ops.quote_name(MoviePopularity._meta.db_table)
+    column = connection.ops.quote_name(field)
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            params = []
+            for (movie_id, state_id), count in batch:
+                params += [
+                    movie_id, state_id,
+                    count if field == "purchase_count" else 0,
+                    count if field == "view_count" else 0,
+                    now,
+                ]
+            placeholders = ", ".join(["(%s, %s, %s, %s, %s)"] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} (movie_id, state_id, purchase_count, view_count, last_updated) "
+                f"VALUES {placeholders} "
+                f"ON CONFLICT (movie_id, state_id) DO UPDATE SET "
+                f"{column} = {table}.{column} + excluded.{column}, "
+                f"last_updated = excluded.last_updated",
+                params,
+            )
+
+
+def _update_or_create(field, deltas):
+    for (movie_id, state_id), count in deltas.items():
+        updated = MoviePopularity.objects.filter(movie_id=movie_id, state_id=state_id).update(
+            **{field: F(field) + count, "last_updated": timezone.now()}
+        )
+        if not updated:
+            MoviePopularity.objects.create(movie_id=movie_id, state_id=state_id, **{field: count})
+
+
+def merge_sketches(sketches):
+    """Merge {(movie_id, state_id, day): registers} into the stored sketches"""
+    if not sketches:
+        return
+    keys = list(sketches)
+    with transaction.atomic():
+        for start in range(0, len(keys), UPSERT_BATCH_SIZE):
+            batch = keys[start:start + UPSERT_BATCH_SIZE]
+            # Create missing rows first so the locked read below sees every
+            # key; on SQLite this write also takes the database write lock
+            MovieViewerSketch.objects.bulk_create(
+                [
+                    MovieViewerSketch(movie_id=movie_id, state_id=state_id, day=day,
+                                      registers=bytes(hll.REGISTERS))
+                    for movie_id, state_id, day in batch
+                ],
+                ignore_conflicts=True,
+            )
+            wanted = set(batch)
+            rows = [
+                row for row in MovieViewerSketch.objects.select_for_update().filter(
+                    movie_id__in={key[0] for key in batch},
+                    state_id__in={key[1] for key in batch},
+                    day__in={key[2] for key in batch},
+                )
+                if (row.movie_id, row.state_id, row.day) in wanted
+            ]
+            for row in rows:
+                row.registers = hll.merge(row.registers, sketches[(row.movie_id, row.state_id, row.day)])
+            MovieViewerSketch.objects.bulk_update(rows, ["registers"])
+
+
+def unique_viewers(movie_ids, state_id=None, days=UNIQUE_VIEWER_DAYS):
+    """Approximate distinct viewers per movie over the last `days` days.
+
+    Sketches of every day (and every state, unless state_id is given) are
+    merged before estimating, so a user is counted once per movie.
+    """
+    sketches = MovieViewerSketch.objects.filter(
+        movie_id__in=list(movie_ids),
+        day__gt=timezone.localdate() - timedelta(days=days),
+    )
+    if state_id is not None:
+        sketches = sketches.filter(state_id=state_id)
+    by_movie = {}
+    for movie_id, registers in sketches.values_list("movie_id", "registers"):
+        by_movie.setdefault(movie_id, []).append(registers)
+    return {movie_id: hll.estimate(hll.merge(*parts)) for movie_id, parts in by_movie.items()}
+
+
+class ViewCounter:
+    """In-process write-behind buffer for MoviePopularity.view_count"""
+
+    def __init__(self, flush_interval=None, max_keys=None):
+        self._flush_interval = flush_interval
+        self._max_keys = max_keys
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._sketches = {}
+        self._thread = None
+        self._pid = None
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, "VIEW_COUNTER_FLUSH_INTERVAL", 5.0)
+
+    @property
+    def max_keys(self):
+        if self._max_keys is not None:
+            return self._max_keys
+        return getattr(settings, "VIEW_COUNTER_MAX_KEYS", 10000)
+
+    def add(self, movie_id, state_id, count=1, viewer=None):
+        """Count views of a movie from a state; viewer identifies the user"""
+        day = timezone.localdate()
+        if self.flush_interval <= 0:
+            increment_popularity("view_count", {(movie_id, state_id): count})
+            if viewer is not None:
+                sketch = hll.empty()
+                hll.add(sketch, viewer)
+                merge_sketches({(movie_id, state_id, day): sketch})
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # First view in this process, or a forked worker that
+                # inherited its parent's buffer but not its flush thread
+                self._pending = Counter()
+                self._sketches = {}
+                self._start_flusher()
+            self._pending[(movie_id, state_id)] += count
+            if viewer is not None:
+                sketch_key = (movie_id, state_id, day)
+                if sketch_key not in self._sketches:
+                    self._sketches[sketch_key] = hll.empty()
+                hll.add(self._sketches[sketch_key], viewer)
+            full = max(len(self._pending), len(self._sketches)) >= self.max_keys
+        if full:
+            self.flush()
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self):
+        """Write all pending views; returns the number of keys written"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            sketches, self._sketches = self._sketches, {}
+        if not pending and not sketches:
+            return 0
+        try:
+            with transaction.atomic():
+                increment_popularity("view_count", pending)
+                merge_sketches(sketches)
+        except Exception:
+            logger.exception("Could not flush %d buffered view counts", len(pending))
+            self._requeue(pending, sketches)
+            return 0
+        return len(pending)
+
+    def _requeue(self, pending, sketches):
+        """Put failed increments back without growing past max_keys"""
+        with self._lock:
+            dropped = 0
+            for key, count in pending.items():
+                if key in self._pending or len(self._pending) < self.max_keys:
+                    self._pending[key] += count
+                else:
+                    dropped += 1
+            for key, sketch in sketches.items():
+                if key in self._sketches:
+                    self._sketches[key] = bytearray(hll.merge(self._sketches[key], sketch))
+                elif len(self._sketches) < self.max_keys:
+                    self._sketches[key] = sketch
+                else:
+                    dropped += 1
+        if dropped:
+            logger.warning("Dropped view counts for %d keys after a failed flush", dropped)
+
+    def _start_flusher(self):
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="view-counter-flush", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            finally:
+                # The flusher thread owns its own connection; don't hold it open
+                connection.close()
+
+
+view_counter = ViewCounter()
+atexit.register(view_counter.flush)
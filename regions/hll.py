@@ -0,0 +1,62 @@
+"""HyperLogLog sketches for approximate distinct counts.
+
+A sketch is PRECISION-bit bucketed: 2**PRECISION one-byte registers, each
+holding the longest run of leading zero bits (plus one) seen among the
+64-bit hashes that fell into its bucket. Sketches are plain bytes, so they
+can be stored in a BinaryField, and merging is a register-wise max, so the
+sketches of several states or days combine into the sketch of their union.
+
+With PRECISION = 10 a sketch takes 1 KiB and the standard error of the
+estimate is about 1.04 / sqrt(1024), i.e. 3%.
+"""
+import hashlib
+
+import numpy as np
+
+PRECISION = 10
+REGISTERS = 1 << PRECISION
+HASH_BITS = 64
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+
+
+def empty():
+    return bytearray(REGISTERS)
+
+
+def hash_value(value):
+    digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def add(registers, value):
+    """Record value in a mutable sketch; returns True if a register grew"""
+    hashed = hash_value(value)
+    bucket = hashed >> (HASH_BITS - PRECISION)
+    rest = hashed & ((1 << (HASH_BITS - PRECISION)) - 1)
+    rank = HASH_BITS - PRECISION - rest.bit_length() + 1
+    if rank > registers[bucket]:
+        registers[bucket] = rank
+        return True
+    return False
+
+
+def merge(*sketches):
+    """The sketch of the union of the given sketches"""
+    sketches = [bytes(sketch) for sketch in sketches if sketch]
+    if not sketches:
+        return bytes(REGISTERS)
+    stacked = np.frombuffer(b"".join(sketches), dtype=np.uint8).reshape(len(sketches), REGISTERS)
+    return stacked.max(axis=0).tobytes()
+
+
+def estimate(sketch):
+    """Approximate number of distinct values recorded in the sketch"""
+    if not sketch:
+        return 0
+    registers = np.frombuffer(bytes(sketch), dtype=np.uint8)
+    raw = _ALPHA * REGISTERS * REGISTERS / np.sum(np.ldexp(1.0, -registers.astype(np.int32)))
+    zeros = REGISTERS - np.count_nonzero(registers)
+    if raw <= 2.5 * REGISTERS and zeros:
+        # Small cardinalities: linear counting over the empty registers
+        raw = REGISTERS * np.log(REGISTERS / zeros)
+    return int(round(raw))
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from regions.counters import UNIQUE_VIEWER_DAYS
+from regions.models import MovieViewerSketch
+
+
+class Command(BaseCommand):
+    help = 'Delete unique-viewer sketches older than the reporting window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=UNIQUE_VIEWER_DAYS,
+                            help='Keep sketches of this many most recent days')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.localdate() - timedelta(days=options['days'])
+        deleted, _ = MovieViewerSketch.objects.filter(day__lte=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} viewer sketches up to {cutoff}.'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0013_review_feed'),
+        ('regions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieViewerSketch',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('registers', models.BinaryField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='movies.movie')),
+                ('state', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='regions.state')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='viewer_sketch_day_idx')],
+                'unique_together': {('movie', 'state', 'day')},
+            },
+        ),
+    ]
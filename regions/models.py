@@ -36,4 +36,22 @@ class MoviePopularity(models.Model):
     @property
     def total_activity(self):
         """Combined score for ranking"""
-        return self.purchase_count + (self.view_count * 0.1)  # Views weighted less than purchases
\ No newline at end of file
+        return self.purchase_count + (self.view_count * 0.1)  # Views weighted less than purchases
+
+
+class MovieViewerSketch(models.Model):
+    """HyperLogLog sketch of the distinct users who viewed a movie in a state on a day"""
+    id = models.AutoField(primary_key=True)
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
+    state = models.ForeignKey(State, on_delete=models.CASCADE)
+    day = models.DateField()
+    registers = models.BinaryField()
+
+    class Meta:
+        unique_together = ['movie', 'state', 'day']
+        indexes = [
+            models.Index(fields=['day'], name='viewer_sketch_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} in {self.state_id} on {self.day}"
@@ -1,3 +1,144 @@
+import os
+from unittest import mock
+
+from django.db import DatabaseError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from movies.models import Movie
+from . import hll
+from .counters import ViewCounter, unique_viewers
+from .models import MoviePopularity, MovieViewerSketch, State
+
+
+class ManualViewCounter(ViewCounter):
+    """A ViewCounter flushed only by the test, without the background thread"""
+
+    def _start_flusher(self):
+        self._pid = os.getpid()
+
+
+class CounterTestCase(TestCase):
+    def setUp(self):
+        self.movies = [
+            Movie.objects.create(name=f'Movie {n}', price=10, description='A movie') for n in range(3)
+        ]
+        self.georgia = State.objects.create(name='Georgia', abbreviation='GA', center_lat=33.0, center_lng=-83.0)
+        self.texas = State.objects.create(name='Texas', abbreviation='TX', center_lat=31.0, center_lng=-99.0)
+
+    def view_counts(self):
+        return {
+            (movie_id, state_id): views
+            for movie_id, state_id, views in MoviePopularity.objects.values_list('movie_id', 'state_id', 'view_count')
+        }
+
+
+class ViewCounterTests(CounterTestCase):
+    def test_flush_writes_buffered_views_in_one_upsert(self):
+        counter = ManualViewCounter(flush_interval=60, max_keys=100)
+        for _ in range(10):
+            for movie in self.movies:
+                counter.add(movie.id, self.georgia.id)
+        counter.add(self.movies[0].id, self.texas.id, count=5)
+        self.assertEqual(MoviePopularity.objects.count(), 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(counter.flush(), 4)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "regions_moviepopularity"')]
+        self.assertEqual(len(inserts), 1)
+        expected = {(movie.id, self.georgia.id): 10 for movie in self.movies}
+        expected[(self.movies[0].id, self.texas.id)] = 5
+        self.assertEqual(self.view_counts(), expected)
+        self.assertEqual(counter.pending(), {})
+
+    def test_flush_adds_to_existing_counts(self):
+        counter = ManualViewCounter(flush_interval=60, max_keys=100)
+        counter.add(self.movies[0].id, self.georgia.id)
+        counter.flush()
+        counter.add(self.movies[0].id, self.georgia.id, count=2)
+        counter.flush()
+        self.assertEqual(self.view_counts(), {(self.movies[0].id, self.georgia.id): 3})
+
+    def test_reaching_max_keys_flushes(self):
+        counter = ManualViewCounter(flush_interval=60, max_keys=2)
+        counter.add(self.movies[0].id, self.georgia.id)
+        self.assertEqual(MoviePopularity.objects.count(), 0)
+        counter.add(self.movies[1].id, self.georgia.id)
+        self.assertEqual(MoviePopularity.objects.count(), 2)
+        self.assertEqual(counter.pending(), {})
+
+    def test_failed_flush_requeues_within_max_keys(self):
+        counter = ManualViewCounter(flush_interval=60, max_keys=3)
+        a = (self.movies[0].id, self.georgia.id)
+        b = (self.movies[1].id, self.georgia.id)
+        c = (self.movies[2].id, self.georgia.id)
+        d = (self.movies[0].id, self.texas.id)
+        counter.add(*a)
+        counter.add(*b)
+
+        def fail_while_more_views_arrive(field, deltas):
+            counter.add(*a)
+            counter.add(*d)
+            raise DatabaseError('database is locked')
+
+        # C fills the buffer and triggers the flush
+        with mock.patch('regions.counters.increment_popularity', side_effect=fail_while_more_views_arrive):
+            with self.assertLogs('regions.counters', 'WARNING') as logs:
+                counter.add(*c)
+
+        # A is merged, B fits, C would exceed max_keys and is dropped
+        self.assertEqual(counter.pending(), {a: 2, d: 1, b: 1})
+        self.assertIn('Dropped view counts for 1 keys', logs.output[-1])
+        self.assertEqual(MoviePopularity.objects.count(), 0)
+
+        counter.flush()
+        self.assertEqual(self.view_counts(), {a: 2, d: 1, b: 1})
+
+
+class UniqueViewerTests(CounterTestCase):
+    def test_repeat_viewers_count_once(self):
+        counter = ViewCounter(flush_interval=0)
+        movie = self.movies[0]
+        for viewer in range(3):
+            for _ in range(5):
+                counter.add(movie.id, self.georgia.id, viewer=viewer)
+        counter.add(movie.id, self.texas.id, viewer=0)
+        counter.add(movie.id, self.texas.id, viewer=99)
+
+        self.assertEqual(self.view_counts()[(movie.id, self.georgia.id)], 15)
+        self.assertEqual(unique_viewers([movie.id]), {movie.id: 4})
+        self.assertEqual(unique_viewers([movie.id], state_id=self.georgia.id), {movie.id: 3})
+        self.assertEqual(unique_viewers([movie.id], state_id=self.texas.id), {movie.id: 2})
+
+    def test_buffered_sketches_merge_into_stored_ones(self):
+        counter = ManualViewCounter(flush_interval=60, max_keys=100)
+        movie = self.movies[0]
+        for viewer in range(50):
+            counter.add(movie.id, self.georgia.id, viewer=viewer)
+        counter.flush()
+        for viewer in range(25, 75):
+            counter.add(movie.id, self.georgia.id, viewer=viewer)
+        counter.flush()
+        self.assertEqual(MovieViewerSketch.objects.count(), 1)
+        self.assertAlmostEqual(unique_viewers([movie.id])[movie.id], 75, delta=75 * 0.1)
+
+
+class HyperLogLogTests(TestCase):
+    def sketch(self, values):
+        registers = hll.empty()
+        for value in values:
+            hll.add(registers, value)
+        return registers
+
+    def test_estimate_is_close(self):
+        for count in (10, 1000, 50000):
+            self.assertAlmostEqual(hll.estimate(self.sketch(range(count))), count, delta=count * 0.1)
+
+    def test_repeated_values_do_not_grow_the_sketch(self):
+        registers = self.sketch(range(100))
+        self.assertFalse(any(hll.add(registers, value) for value in range(100)))
 
-# Create your tests here.
+    def test_merge_estimates_the_union(self):
+        merged = hll.merge(self.sketch(range(0, 6000)), self.sketch(range(4000, 10000)))
+        self.assertAlmostEqual(hll.estimate(merged), 10000, delta=1000)
+        self.assertEqual(hll.merge(), bytes(hll.REGISTERS))
+        self.assertEqual(hll.estimate(b''), 0)
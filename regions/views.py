@@ -2,7 +2,43 @@ from django.shortcuts import render
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from .models import State, MoviePopularity
-from movies.models import Movie
+from .counters import unique_viewers
+from movies.images import image_fields
+from movies import snapshot
+
+
+def movie_data(movie, **stats):
+    """JSON fields of a catalog snapshot record, with stats after the name"""
+    return {
+        'id': movie.id,
+        'name': movie.name,
+        **stats,
+        **image_fields(movie.image),
+        'price': movie.price,
+        'genre': movie.genre,
+        'rating': movie.rating,
+    }
+
+
+def popularity_data(popularity_rows):
+    """Serialize MoviePopularity rows, reading movie fields from the snapshot"""
+    rows = list(popularity_rows)
+    movies = snapshot.records(row.movie_id for row in rows)
+    viewers = {
+        state_id: unique_viewers({row.movie_id for row in rows if row.state_id == state_id}, state_id)
+        for state_id in {row.state_id for row in rows}
+    }
+    return [
+        movie_data(
+            movies[row.movie_id],
+            purchase_count=row.purchase_count,
+            view_count=row.view_count,
+            unique_viewers=viewers[row.state_id].get(row.movie_id, 0),
+            total_activity=row.total_activity,
+        )
+        for row in rows
+        if row.movie_id in movies
+    ]
 
 
 def map_view(request):
@@ -20,20 +56,7 @@ def state_movies_api(request, state_id):
         state = State.objects.get(id=state_id)
         # Get top 10 movies by total activity for this state
         popular_movies = MoviePopularity.objects.filter(state=state).order_by('-purchase_count', '-view_count')[:10]
-        
-        movies_data = []
-        for movie_pop in popular_movies:
-            movies_data.append({
-                'id': movie_pop.movie.id,
-                'name': movie_pop.movie.name,
-                'purchase_count': movie_pop.purchase_count,
-                'view_count': movie_pop.view_count,
-                'total_activity': movie_pop.total_activity,
-                'image_url': f'/media/movie_images/{movie_pop.movie.image}' if movie_pop.movie.image else None,
-                'price': movie_pop.movie.price,
-                'genre': movie_pop.movie.genre,
-                'rating': movie_pop.movie.rating,
-            })
+        movies_data = popularity_data(popular_movies)
         
         return JsonResponse({
             'state': {
@@ -61,20 +84,20 @@ def global_trending_api(request):
         total_views=Sum('view_count'),
         state_count=Count('state')
     ).order_by('-total_purchases', '-total_views')[:20]
+    movie_stats = list(movie_stats)
+    movies = snapshot.records(stat['movie'] for stat in movie_stats)
+    viewers = unique_viewers(movies)
     
     for stat in movie_stats:
-        movie = Movie.objects.get(id=stat['movie'])
-        movies_data.append({
-            'id': movie.id,
-            'name': movie.name,
-            'total_purchases': stat['total_purchases'],
-            'total_views': stat['total_views'],
-            'state_count': stat['state_count'],
-            'image_url': f'/media/movie_images/{movie.image}' if movie.image else None,
-            'price': movie.price,
-            'genre': movie.genre,
-            'rating': movie.rating,
-        })
+        if stat['movie'] not in movies:
+            continue
+        movies_data.append(movie_data(
+            movies[stat['movie']],
+            total_purchases=stat['total_purchases'],
+            total_views=stat['total_views'],
+            unique_viewers=viewers.get(stat['movie'], 0),
+            state_count=stat['state_count'],
+        ))
     
     return JsonResponse({'movies': movies_data})
 
@@ -115,33 +138,8 @@ def compare_states_api(request):
         state2_movies = MoviePopularity.objects.filter(state=state2).order_by('-purchase_count', '-view_count')[:10]
         
         # Convert to dictionaries for easier comparison
-        state1_data = []
-        for movie_pop in state1_movies:
-            state1_data.append({
-                'id': movie_pop.movie.id,
-                'name': movie_pop.movie.name,
-                'purchase_count': movie_pop.purchase_count,
-                'view_count': movie_pop.view_count,
-                'total_activity': movie_pop.total_activity,
-                'image_url': f'/media/movie_images/{movie_pop.movie.image}' if movie_pop.movie.image else None,
-                'price': movie_pop.movie.price,
-                'genre': movie_pop.movie.genre,
-                'rating': movie_pop.movie.rating,
-            })
-        
-        state2_data = []
-        for movie_pop in state2_movies:
-            state2_data.append({
-                'id': movie_pop.movie.id,
-                'name': movie_pop.movie.name,
-                'purchase_count': movie_pop.purchase_count,
-                'view_count': movie_pop.view_count,
-                'total_activity': movie_pop.total_activity,
-                'image_url': f'/media/movie_images/{movie_pop.movie.image}' if movie_pop.movie.image else None,
-                'price': movie_pop.movie.price,
-                'genre': movie_pop.movie.genre,
-                'rating': movie_pop.movie.rating,
-            })
+        state1_data = popularity_data(state1_movies)
+        state2_data = popularity_data(state2_movies)
         
         return JsonResponse({
             'state1': {
@@ -180,10 +178,9 @@ def personal_purchases_api(request):
     for order in orders:
         items = Item.objects.filter(order=order)
         for item in items:
-            movie_id = item.movie.id
+            movie_id = item.movie_id
             if movie_id not in movie_purchases:
                 movie_purchases[movie_id] = {
-                    'movie': item.movie,
                     'total_quantity': 0,
                     'total_spent': 0,
                     'purchase_dates': []
@@ -194,18 +191,10 @@ def personal_purchases_api(request):
     
     # Convert to list and sort by total quantity
     personal_data = []
+    movies = snapshot.records(movie_purchases)
     for movie_id, data in movie_purchases.items():
-        personal_data.append({
-            'id': data['movie'].id,
-            'name': data['movie'].name,
-            'total_quantity': data['total_quantity'],
-            'total_spent': data['total_spent'],
-            'purchase_dates': data['purchase_dates'],
-            'image_url': f'/media/movie_images/{data["movie"].image}' if data['movie'].image else None,
-            'price': data['movie'].price,
-            'genre': data['movie'].genre,
-            'rating': data['movie'].rating,
-        })
+        if movie_id in movies:
+            personal_data.append(movie_data(movies[movie_id], **data))
     
     # Sort by total quantity (most purchased first)
     personal_data.sort(key=lambda x: x['total_quantity'], reverse=True)
@@ -258,10 +247,9 @@ def other_users_api(request):
         for order in orders:
             items = Item.objects.filter(order=order)
             for item in items:
-                movie_id = item.movie.id
+                movie_id = item.movie_id
                 if movie_id not in movie_purchases:
                     movie_purchases[movie_id] = {
-                        'movie': item.movie,
                         'total_quantity': 0,
                         'total_spent': 0
                     }
@@ -270,17 +258,10 @@ def other_users_api(request):
         
         # Convert to list and sort by total quantity
         user_purchases = []
+        movies = snapshot.records(movie_purchases)
         for movie_id, data in movie_purchases.items():
-            user_purchases.append({
-                'id': data['movie'].id,
-                'name': data['movie'].name,
-                'total_quantity': data['total_quantity'],
-                'total_spent': data['total_spent'],
-                'image_url': f'/media/movie_images/{data["movie"].image}' if data['movie'].image else None,
-                'price': data['movie'].price,
-                'genre': data['movie'].genre,
-                'rating': data['movie'].rating,
-            })
+            if movie_id in movies:
+                user_purchases.append(movie_data(movies[movie_id], **data))
         
         # Sort by total quantity
         user_purchases.sort(key=lambda x: x['total_quantity'], reverse=True)
@@ -326,10 +307,9 @@ def compare_personal_state_api(request):
     for order in orders:
         items = Item.objects.filter(order=order)
         for item in items:
-            movie_id = item.movie.id
+            movie_id = item.movie_id
             if movie_id not in movie_purchases:
                 movie_purchases[movie_id] = {
-                    'movie': item.movie,
                     'total_quantity': 0,
                     'total_spent': 0
                 }
@@ -341,32 +321,13 @@ def compare_personal_state_api(request):
     
     # Convert personal data
     personal_data = []
+    movies = snapshot.records(movie_purchases)
     for movie_id, data in movie_purchases.items():
-        personal_data.append({
-            'id': data['movie'].id,
-            'name': data['movie'].name,
-            'total_quantity': data['total_quantity'],
-            'total_spent': data['total_spent'],
-            'image_url': f'/media/movie_images/{data["movie"].image}' if data['movie'].image else None,
-            'price': data['movie'].price,
-            'genre': data['movie'].genre,
-            'rating': data['movie'].rating,
-        })
+        if movie_id in movies:
+            personal_data.append(movie_data(movies[movie_id], **data))
     
     # Convert state data
-    state_data = []
-    for movie_pop in state_movies:
-        state_data.append({
-            'id': movie_pop.movie.id,
-            'name': movie_pop.movie.name,
-            'purchase_count': movie_pop.purchase_count,
-            'view_count': movie_pop.view_count,
-            'total_activity': movie_pop.total_activity,
-            'image_url': f'/media/movie_images/{movie_pop.movie.image}' if movie_pop.movie.image else None,
-            'price': movie_pop.movie.price,
-            'genre': movie_pop.movie.genre,
-            'rating': movie_pop.movie.rating,
-        })
+    state_data = popularity_data(state_movies)
     
     return JsonResponse({
         'personal': {